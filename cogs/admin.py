@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import asyncio
+
 import discord
 import structlog
 from discord import app_commands
 from discord.ext import commands
 
-from core.llm_gateway import LLMGateway
-from database.connection import cleanup_old_data
+from database.connection import cleanup_old_data, ping
 from database import user_store
+from services import redis_client as rc
 
 logger = structlog.get_logger("twomoon.cog.admin")
 
+PROBE_TIMEOUT_SECONDS = 1.0
+STATUS_CACHE_KEY = "admin:status:v1"
+STATUS_CACHE_TTL = 10
+
 
 # ═══════════════════════════════════════════════
 # ADMIN COG
@@ -29,26 +35,38 @@ class AdminCog(commands.Cog):
     # ═══ /admin status ═══
 
     @admin_group.command(name="status", description="Bot health and provider status")
-    async def status(self, interaction: discord.Interaction) -> None:
+    @app_commands.describe(fresh="Bypass the cached status and probe everything now")
+    async def status(self, interaction: discord.Interaction, fresh: bool = False) -> None:
         await interaction.response.defer(ephemeral=True)
 
-        gateway = LLMGateway(settings=self.bot.settings, redis=self.bot.pools.redis)
-        provider_status = await gateway.get_provider_status()
-
-        db_ok = False
-        try:
-            async with self.bot.pools.db.acquire() as conn:
-                await conn.fetchval("SELECT 1")
-            db_ok = True
-        except Exception:
-            pass
+        if not fresh:
+            cached = await rc.cache_get(self.bot.pools.redis, STATUS_CACHE_KEY)
+            if cached:
+                await interaction.followup.send(cached, ephemeral=True)
+                return
 
-        redis_ok = False
-        try:
+        async def _probe_redis() -> bool:
             await self.bot.pools.redis.ping()
-            redis_ok = True
-        except Exception:
-            pass
+            return True
+
+        db_result, redis_result, provider_result = await asyncio.gather(
+            asyncio.wait_for(ping(self.bot.pools.db), timeout=PROBE_TIMEOUT_SECONDS),
+            asyncio.wait_for(_probe_redis(), timeout=PROBE_TIMEOUT_SECONDS),
+            asyncio.wait_for(self.bot.gateway.get_provider_status(), timeout=PROBE_TIMEOUT_SECONDS),
+            return_exceptions=True,
+        )
+
+        db_ok = db_result is True
+        redis_ok = redis_result is True
+
+        if isinstance(provider_result, BaseException):
+            logger.warning("provider_status_failed", error=str(provider_result))
+            provider_status = {
+                "groq": {"circuit": "unknown"},
+                "openrouter": {"circuit": "unknown"},
+            }
+        else:
+            provider_status = provider_result
 
         router_ok = self.bot.local_router is not None and self.bot.local_router._ready
 
@@ -75,7 +93,9 @@ class AdminCog(commands.Cog):
             f"Guilds: `{len(self.bot.guilds)}`",
         ]
 
-        await interaction.followup.send("\n".join(lines), ephemeral=True)
+        payload = "\n".join(lines)
+        await rc.cache_set(self.bot.pools.redis, STATUS_CACHE_KEY, payload, STATUS_CACHE_TTL)
+        await interaction.followup.send(payload, ephemeral=True)
 
     # ═══ /admin stats ═══
 
@@ -83,8 +103,9 @@ class AdminCog(commands.Cog):
     async def stats(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer(ephemeral=True)
 
-        total_users = await user_store.get_total_users(self.bot.pools.db)
-        top_users = await user_store.get_top_users(self.bot.pools.db, limit=5)
+        bundle = await user_store.get_stats_bundle(self.bot.pools.db, limit=5)
+        total_users = bundle["total"]
+        top_users = bundle["top_users"]
 
         lines = [
             "**2M_Gumiho Stats**",
@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 import json
 import random
+import re
 
 import discord
 import structlog
@@ -12,18 +13,14 @@ from core.context_manager import ContextManager
 from core.llm_gateway import LLMGateway
 from core.persona_engine import build_system_prompt
 from core.router import RouteType
-from database import memory_store, user_store
+from database import memory_store, persona_store
 from services import redis_client as rc
-from utils.text import (
-    clean_bot_mentions,
-    detect_language,
-    extract_image_url,
-    has_any_image,
-    sanitize,
-)
+from utils.text import preprocess_message
 
 logger = structlog.get_logger("twomoon.cog.chat")
 
+MIN_EMBED_LENGTH = 10
+
 
 # ═══════════════════════════════════════════════
 # CHAT COG
@@ -32,21 +29,22 @@ logger = structlog.get_logger("twomoon.cog.chat")
 class ChatCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self._gateway: LLMGateway | None = None
         self._context_mgr: ContextManager | None = None
+        # Strong references for fire-and-forget tasks; the loop keeps weak ones.
+        self._background_tasks: set[asyncio.Task] = set()
+
+    @property
+    def _gateway(self) -> LLMGateway:
+        return self.bot.gateway
 
     def _ensure_services(self) -> bool:
-        if self._gateway is None:
-            self._gateway = LLMGateway(
-                settings=self.bot.settings,
-                redis=self.bot.pools.redis,
-            )
         if self._context_mgr is None:
             self._context_mgr = ContextManager(
                 config=self.bot.settings.context,
                 db_pool=self.bot.pools.db,
                 redis=self.bot.pools.redis,
                 router=self.bot.local_router,
+                embedder=self.bot.embedder,
             )
         return True
 
@@ -55,29 +53,30 @@ class ChatCog(commands.Cog):
         if message.author.bot:
             return
 
-        guild_id = message.guild.id if message.guild else 0
-        allowed_id = self.bot.settings.discord.allowed_server_id
+        # ═══ ADDRESSED? (cheapest checks first) ═══
+        is_mentioned = self.bot.user in message.mentions
+        if not is_mentioned and message.reference is None:
+            return
 
-        if message.guild and str(guild_id) != str(allowed_id):
+        guild_id = message.guild.id if message.guild else 0
+        if message.guild and guild_id != self.bot.settings.discord.allowed_server_id:
             return
-            
+
         if message.channel.id in self.bot.settings.discord.ignored_channel_ids:
             return
 
-        is_mentioned = self.bot.user in message.mentions
-        is_reply_to_bot = await self._is_reply_to_bot(message)
-
-        if not is_mentioned and not is_reply_to_bot:
+        if not is_mentioned and not await self._is_reply_to_bot(message):
             return
 
         self._ensure_services()
 
-        content = clean_bot_mentions(message.content, self.bot.user.id)
-        content = sanitize(content)
-        image_present = has_any_image(message)
+        prepared = preprocess_message(message, self.bot.user.id)
+        content = prepared.content
 
         # ═══ GATEKEEPER ═══
-        route_result = self.bot.local_router.classify(content, has_image=image_present)
+        route_result = await self.bot.local_router.classify_batched(
+            content, self.bot.embedder, has_image=prepared.has_image,
+        )
         logger.debug("route_classified", route=route_result.route, confidence=route_result.confidence)
 
         if route_result.route == RouteType.IGNORE:
@@ -102,29 +101,29 @@ class ChatCog(commands.Cog):
             await message.reply(f"sabar {rate_check['reset_in']}s", mention_author=False)
             return
 
-        await message.channel.typing()
+        # The typing indicator is its own Discord API call; let it run alongside
+        # context and persona loading instead of in front of them. The local
+        # reference keeps it alive, and the finally below reaps it.
+        typing_task = asyncio.create_task(_send_typing(message.channel))
 
         try:
-            # ═══ CONTEXT ═══
-            context = await self._context_mgr.build(message)
-            
+            # ═══ CONTEXT + PERSONA ═══
+            context, persona = await asyncio.gather(
+                self._context_mgr.build(message),
+                self._get_persona(str(message.author.id), str(guild_id)),
+            )
+
             member = getattr(message, "member", None)
             display_name = member.display_name if member else message.author.display_name
-            
-            language = detect_language(content) or context.language
+
+            language = prepared.language or context.language
             nick = _extract_short_name(display_name)
 
-            await user_store.upsert_user(
-                self.bot.pools.db,
-                str(message.author.id),
-                display_name,
-                language,
-            )
+            self.bot.interactions.record(str(message.author.id), display_name, language)
 
             mention_map = self._context_mgr.build_mention_map(context)
 
             user_messages_for_style = None
-            persona = await self._get_persona(str(message.author.id), str(guild_id))
             if persona["preset"] == "matchuser":
                 user_messages_for_style = [
                     m.content for m in context.channel_history
@@ -141,13 +140,14 @@ class ChatCog(commands.Cog):
                 language=language,
                 mention_map=mention_map,
                 talking_to=nick,
+                persona=persona,
             )
 
             user_context = self._context_mgr.format(context, message)
 
             # ═══ LLM GATEWAY ═══
             if route_result.is_vision:
-                image_url = extract_image_url(message)
+                image_url = prepared.image_url
                 if image_url:
                     response = await self._gateway.generate_vision(
                         system_prompt=system_prompt,
@@ -192,7 +192,9 @@ class ChatCog(commands.Cog):
             await message.reply(reply_text, mention_author=False)
 
             # ═══ POST-PROCESSING (fire-and-forget) ═══
-            asyncio.create_task(self._post_process(message, content, reply_text))
+            task = asyncio.create_task(self._post_process(message, content, reply_text))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
 
         except Exception as error:
             logger.error("chat_pipeline_failed", error=str(error))
@@ -200,6 +202,9 @@ class ChatCog(commands.Cog):
                 await message.reply("my brain glitched sry", mention_author=False)
             except Exception:
                 pass
+        finally:
+            # No-op once the indicator was sent; stops it if the pipeline bailed early.
+            typing_task.cancel()
 
     # ═══════════════════════════════════════════
     # POST-PROCESSING
@@ -212,38 +217,38 @@ class ChatCog(commands.Cog):
         reply_text: str,
     ) -> None:
         try:
-            embedding = None
-            if self.bot.local_router and len(content) >= 10:
-                embedding = self.bot.local_router.get_embedding(content)
-
-            await memory_store.save_conversation(
-                pool=self.bot.pools.db,
-                channel_id=str(message.channel.id),
-                message_id=str(message.id),
-                user_id=str(message.author.id),
-                content=content,
-                embedding=embedding,
-                is_bot=False,
+            embedding, bot_embedding = await asyncio.gather(
+                self._embed(content),
+                self._embed(reply_text),
             )
 
-            bot_embedding = None
-            if self.bot.local_router and len(reply_text) >= 10:
-                bot_embedding = self.bot.local_router.get_embedding(reply_text)
-
-            await memory_store.save_conversation(
-                pool=self.bot.pools.db,
-                channel_id=str(message.channel.id),
-                message_id=f"{message.id}_bot",
-                user_id=str(self.bot.user.id),
-                content=reply_text,
-                embedding=bot_embedding,
-                is_bot=True,
-            )
-
-            await memory_store.save_memory(
-                self.bot.pools.db,
-                str(message.author.id),
-                content,
+            await asyncio.gather(
+                memory_store.save_conversations_bulk(
+                    self.bot.pools.db,
+                    [
+                        {
+                            "channel_id": message.channel.id,
+                            "message_id": message.id,
+                            "user_id": message.author.id,
+                            "content": content,
+                            "embedding": embedding,
+                            "is_bot": False,
+                        },
+                        {
+                            "channel_id": message.channel.id,
+                            "message_id": f"{message.id}_bot",
+                            "user_id": self.bot.user.id,
+                            "content": reply_text,
+                            "embedding": bot_embedding,
+                            "is_bot": True,
+                        },
+                    ],
+                ),
+                memory_store.save_memory(
+                    self.bot.pools.db,
+                    str(message.author.id),
+                    content,
+                ),
             )
 
         except Exception as error:
@@ -254,16 +259,29 @@ class ChatCog(commands.Cog):
     # ═══════════════════════════════════════════
 
     async def _is_reply_to_bot(self, message: discord.Message) -> bool:
-        if not message.reference or not message.reference.message_id:
+        reference = message.reference
+        if not reference or not reference.message_id:
             return False
+
+        resolved = reference.cached_message or reference.resolved
+        if isinstance(resolved, discord.Message):
+            return resolved.author.id == self.bot.user.id
+        if resolved is not None:
+            # DeletedReferencedMessage — nothing left to reply to
+            return False
+
         try:
-            ref = await message.channel.fetch_message(message.reference.message_id)
+            ref = await message.channel.fetch_message(reference.message_id)
             return ref.author.id == self.bot.user.id
         except Exception:
             return False
 
+    async def _embed(self, text: str) -> list[float] | None:
+        if self.bot.embedder is None or len(text) < MIN_EMBED_LENGTH:
+            return None
+        return await self.bot.embedder.embed(text)
+
     async def _get_persona(self, user_id: str, server_id: str) -> dict:
-        from database import persona_store
         return await persona_store.get_effective_persona(
             self.bot.pools.db, self.bot.pools.redis, user_id, server_id,
         )
@@ -273,26 +291,39 @@ class ChatCog(commands.Cog):
 # MODULE-LEVEL HELPERS
 # ═══════════════════════════════════════════
 
-import random
+
+QUICK_REACT_CHANCE = 0.10
+QUICK_REACTIONS = ("👍", "💀", "😂", "🔥")
+
+TYPING_BASE = 0.3
+TYPING_PER_CHAR = 0.015
+TYPING_CHAR_CAP = 1.5
+TYPING_JITTER = (0.1, 0.6)
+TYPING_MAX = 2.5
 
 
 def _should_quick_react() -> bool:
-    return random.random() < 0.10
+    return random.random() < QUICK_REACT_CHANCE
+
+
+async def _send_typing(channel: discord.abc.Messageable) -> None:
+    try:
+        await channel.typing()
+    except Exception:
+        pass
 
 
 async def _quick_react(message: discord.Message) -> None:
-    reactions = ["👍", "💀", "😂", "🔥"]
     try:
-        await message.add_reaction(random.choice(reactions))
+        await message.add_reaction(random.choice(QUICK_REACTIONS))
     except Exception:
         pass
 
 
 def _typing_delay(text: str) -> float:
-    base = 0.3
-    per_char = min(len(text) * 0.015, 1.5)
-    jitter = random.uniform(0.1, 0.6)
-    return min(base + per_char + jitter, 2.5)
+    per_char = min(len(text) * TYPING_PER_CHAR, TYPING_CHAR_CAP)
+    jitter = random.uniform(*TYPING_JITTER)
+    return min(TYPING_BASE + per_char + jitter, TYPING_MAX)
 
 
 def _decide_max_tokens(content: str) -> int:
@@ -304,14 +335,13 @@ def _decide_max_tokens(content: str) -> int:
     return 150
 
 
+_SHORT_NAME_PREFIX_RE = re.compile(r"^(?:2M_|TM_|2m_|tm_|GD_|gd_|DD_|dd_)")
+_SHORT_NAME_SEPARATORS = str.maketrans("_-.", "   ")
+
+
 def _extract_short_name(display_name: str) -> str:
-    prefixes = ["2M_", "TM_", "2m_", "tm_", "GD_", "gd_", "DD_", "dd_"]
-    clean = display_name
-    for prefix in prefixes:
-        if clean.startswith(prefix):
-            clean = clean[len(prefix):]
-            break
-    clean = clean.replace("_", " ").replace("-", " ").replace(".", " ").strip()
+    clean = _SHORT_NAME_PREFIX_RE.sub("", display_name, count=1)
+    clean = clean.translate(_SHORT_NAME_SEPARATORS).strip()
     if len(clean) <= 4:
         return clean
     parts = clean.split()
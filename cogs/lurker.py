@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import asyncio
 import random
+import re
+import time
+from collections import OrderedDict, deque
 
 import discord
 import structlog
@@ -12,6 +15,10 @@ from services import redis_client as rc
 
 logger = structlog.get_logger("twomoon.cog.lurker")
 
+ACTIVITY_WINDOW_SECONDS = 60
+ACTIVITY_IDLE_TTL_SECONDS = 300
+ACTIVITY_MAX_CHANNELS = 2048
+
 
 # ═══════════════════════════════════════════════
 # INTEREST SCORING
@@ -27,26 +34,45 @@ INTEREST_KEYWORDS: dict[str, dict] = {
 }
 
 
+# Flattened keyword -> (topic, weight) map; duplicate keywords within a topic
+# keep counting once per listing, as they did with the per-word scan.
+KEYWORD_TO_TOPIC_WEIGHT: dict[str, tuple[str, int]] = {}
+for _topic, _data in INTEREST_KEYWORDS.items():
+    for _word in _data["words"]:
+        _prior = KEYWORD_TO_TOPIC_WEIGHT.get(_word, (_topic, 0))[1]
+        KEYWORD_TO_TOPIC_WEIGHT[_word] = (_topic, _prior + _data["weight"])
+
+_TOPIC_ORDER = {topic: index for index, topic in enumerate(INTEREST_KEYWORDS)}
+
+# Zero-width lookahead so overlapping keywords are all reported, like `w in text`.
+_INTEREST_RE = re.compile(
+    "(?=("
+    + "|".join(re.escape(w) for w in sorted(KEYWORD_TO_TOPIC_WEIGHT, key=len, reverse=True))
+    + "))"
+)
+
+
 def calculate_interest(content: str, recent_message_count: int) -> tuple[int, str]:
     lower = content.lower()
     score = 0
     top_topic = "general"
-    top_weight = 0
 
-    for topic, data in INTEREST_KEYWORDS.items():
-        matches = sum(1 for w in data["words"] if w in lower)
-        topic_score = matches * data["weight"]
-        score += topic_score
-        if topic_score > top_weight:
-            top_weight = topic_score
-            top_topic = topic
+    topic_scores: dict[str, int] = {}
+    for word in set(_INTEREST_RE.findall(lower)):
+        topic, weight = KEYWORD_TO_TOPIC_WEIGHT[word]
+        topic_scores[topic] = topic_scores.get(topic, 0) + weight
+        score += weight
 
-    if len(content) > 50:
+    if topic_scores:
+        top_topic = min(topic_scores, key=lambda t: (-topic_scores[t], _TOPIC_ORDER[t]))
+
+    length = len(content)
+    if length > 50:
         score += 5
-    if len(content) > 100:
+    if length > 100:
         score += 5
 
-    if any(c * 2 in content for c in "!?"):
+    if "!!" in content or "??" in content:
         score += 8
 
     if recent_message_count > 5:
@@ -62,21 +88,17 @@ def calculate_interest(content: str, recent_message_count: int) -> tuple[int, st
 class LurkerCog(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self._gateway: LLMGateway | None = None
-        self._recent_messages: dict[int, list[float]] = {}
-
-    def _ensure_gateway(self) -> None:
-        if self._gateway is None:
-            self._gateway = LLMGateway(
-                settings=self.bot.settings,
-                redis=self.bot.pools.redis,
-            )
+        self._recent_messages: OrderedDict[int, deque[float]] = OrderedDict()
+
+    @property
+    def _gateway(self) -> LLMGateway:
+        return self.bot.gateway
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
         if message.author.bot:
             return
-        if not message.guild or str(message.guild.id) != str(self.bot.settings.discord.allowed_server_id):
+        if not message.guild or message.guild.id != self.bot.settings.discord.allowed_server_id:
             return
         if message.channel.id not in self.bot.settings.discord.lurker_channel_ids:
             return
@@ -90,20 +112,20 @@ class LurkerCog(commands.Cog):
         if interest < self.bot.settings.lurker.min_interest_score:
             return
 
-        can_lurk = await rc.check_lurker_cooldown(
-            self.bot.pools.redis,
-            str(message.channel.id),
-            self.bot.settings.lurker.cooldown_seconds,
-        )
-        if not can_lurk:
-            return
-
         chance = self.bot.settings.lurker.base_chance + (interest - self.bot.settings.lurker.min_interest_score) * 0.01
         if random.random() > chance:
             return
 
-        self._ensure_gateway()
+        channel_key = str(message.channel.id)
+        acquired = await rc.try_acquire_lurker(
+            self.bot.pools.redis,
+            channel_key,
+            self.bot.settings.lurker.cooldown_seconds,
+        )
+        if not acquired:
+            return
 
+        lurked = False
         try:
             lurk_prompt = (
                 "You're Gumiho (2M_Gumiho), lurking in Discord. "
@@ -133,12 +155,7 @@ class LurkerCog(commands.Cog):
             delay = random.uniform(1.0, 3.0)
             await asyncio.sleep(delay)
             await message.channel.send(reply_text)
-
-            await rc.set_lurker_cooldown(
-                self.bot.pools.redis,
-                str(message.channel.id),
-                self.bot.settings.lurker.cooldown_seconds,
-            )
+            lurked = True
 
             logger.info(
                 "lurk_triggered",
@@ -149,22 +166,42 @@ class LurkerCog(commands.Cog):
 
         except Exception as error:
             logger.error("lurk_failed", error=str(error))
+        finally:
+            # Nothing was said, so don't hold the channel's cooldown.
+            if not lurked:
+                await rc.release_lurker(self.bot.pools.redis, channel_key)
 
     # ═══════════════════════════════════════════
     # ACTIVITY TRACKING (in-memory, lightweight)
     # ═══════════════════════════════════════════
 
     def _track_activity(self, channel_id: int) -> None:
-        import time
         now = time.time()
-        if channel_id not in self._recent_messages:
-            self._recent_messages[channel_id] = []
-        timestamps = self._recent_messages[channel_id]
+        timestamps = self._recent_messages.get(channel_id)
+        if timestamps is None:
+            timestamps = self._recent_messages[channel_id] = deque()
+        else:
+            self._recent_messages.move_to_end(channel_id)
         timestamps.append(now)
-        self._recent_messages[channel_id] = [t for t in timestamps if now - t < 60]
+        cutoff = now - ACTIVITY_WINDOW_SECONDS
+        while timestamps and timestamps[0] <= cutoff:
+            timestamps.popleft()
+
+        self._evict_idle_channels(now)
+
+    def _evict_idle_channels(self, now: float) -> None:
+        # Least recently active channels sit at the front of the OrderedDict.
+        idle_cutoff = now - ACTIVITY_IDLE_TTL_SECONDS
+        while self._recent_messages:
+            oldest_id, oldest = next(iter(self._recent_messages.items()))
+            over_capacity = len(self._recent_messages) > ACTIVITY_MAX_CHANNELS
+            is_idle = not oldest or oldest[-1] <= idle_cutoff
+            if not over_capacity and not is_idle:
+                break
+            del self._recent_messages[oldest_id]
 
     def _get_recent_count(self, channel_id: int) -> int:
-        return len(self._recent_messages.get(channel_id, []))
+        return len(self._recent_messages.get(channel_id, ()))
 
 
 # ═══════════════════════════════════════════════
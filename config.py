@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from functools import lru_cache
+
 from pydantic import Field, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -9,25 +11,26 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 # ═══════════════════════════════════════════════
 
 class DiscordConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="DISCORD_")
+    model_config = SettingsConfigDict(env_prefix="DISCORD_", frozen=True)
 
     token: str = Field(...)
     allowed_server_id: int = Field(default=1452886736874111009)
-    lurker_channel_ids: list[int] = Field(default_factory=lambda: [1452886738497310824])
-    ignored_channel_ids: list[int] = Field(default_factory=list)
+    lurker_channel_ids: frozenset[int] = Field(default_factory=lambda: frozenset({1452886738497310824}))
+    ignored_channel_ids: frozenset[int] = Field(default_factory=frozenset)
 
     @field_validator("lurker_channel_ids", "ignored_channel_ids", mode="before")
     @classmethod
-    def parse_comma_separated_ids(cls, value: str | list) -> list[int]:
+    def parse_comma_separated_ids(cls, value: str | list | frozenset) -> frozenset[int]:
         if isinstance(value, str):
-            return [int(chunk.strip()) for chunk in value.split(",") if chunk.strip()]
-        return value
+            return frozenset(int(chunk.strip()) for chunk in value.split(",") if chunk.strip())
+        return frozenset(int(item) for item in value)
 
 
 class GroqConfig(BaseSettings):
     model_config = SettingsConfigDict(
         env_prefix="GROQ_",
         protected_namespaces=('settings_',),
+        frozen=True,
     )
 
     api_key: str = Field(...)
@@ -39,7 +42,7 @@ class GroqConfig(BaseSettings):
 
 
 class OpenRouterConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="OPENROUTER_")
+    model_config = SettingsConfigDict(env_prefix="OPENROUTER_", frozen=True)
 
     api_key: str = Field(default="")
     base_url: str = Field(default="https://openrouter.ai/api/v1")
@@ -50,39 +53,43 @@ class OpenRouterConfig(BaseSettings):
 
 
 class DatabaseConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="DB_")
+    model_config = SettingsConfigDict(env_prefix="DB_", frozen=True)
 
     url: str = Field(
         default="postgresql://twomoon_admin@localhost:26257/twomoon?sslmode=disable"
     )
-    pool_min_size: int = Field(default=2)
-    pool_max_size: int = Field(default=10)
-    command_timeout: float = Field(default=30.0)
+    pool_min_size: int = Field(default=2, ge=1)
+    pool_max_size: int = Field(default=10, ge=1)
+    command_timeout: float = Field(default=2.0)
+    max_inactive_connection_lifetime: float = Field(default=300.0)
+    statement_cache_size: int = Field(default=1024)
+    max_cached_statement_lifetime: float = Field(default=0.0)
+    max_cacheable_statement_size: int = Field(default=16384)
     ssl: bool = Field(default=False)
 
 
 class RedisConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="REDIS_")
+    model_config = SettingsConfigDict(env_prefix="REDIS_", frozen=True)
     url: str = Field(..., validation_alias="REDIS_URL")
     max_connections: int = Field(default=20)
 
 
 class CircuitBreakerConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="CB_")
+    model_config = SettingsConfigDict(env_prefix="CB_", frozen=True)
 
     fail_max: int = Field(default=5)
     reset_timeout_seconds: int = Field(default=30)
 
 
 class RateLimitConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="RATELIMIT_")
+    model_config = SettingsConfigDict(env_prefix="RATELIMIT_", frozen=True)
 
     max_requests: int = Field(default=20)
     window_seconds: int = Field(default=60)
 
 
 class LurkerConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="LURKER_")
+    model_config = SettingsConfigDict(env_prefix="LURKER_", frozen=True)
 
     min_interest_score: int = Field(default=85)
     cooldown_seconds: int = Field(default=600)
@@ -90,21 +97,29 @@ class LurkerConfig(BaseSettings):
 
 
 class ContextConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="CTX_")
+    model_config = SettingsConfigDict(env_prefix="CTX_", frozen=True)
 
     history_limit: int = Field(default=15)
     reply_chain_depth: int = Field(default=5)
+    history_refresh_after_seconds: int = Field(default=30)
     max_memory_tokens: int = Field(default=800)
     semantic_retrieval_limit: int = Field(default=3)
     semantic_retrieval_window_hours: int = Field(default=24)
 
 
 class RouterConfig(BaseSettings):
-    model_config = SettingsConfigDict(env_prefix="ROUTER_")
+    model_config = SettingsConfigDict(env_prefix="ROUTER_", frozen=True)
 
     embedding_model: str = Field(default="BAAI/bge-small-en-v1.5")
+    embedding_threads: int | None = Field(default=None)
+    utterance_cache_dir: str | None = Field(default=".cache/router")
     similarity_threshold: float = Field(default=0.5)
     chitchat_response_cache_size: int = Field(default=50)
+    long_message_chars: int = Field(default=200)
+    classify_cache_size: int = Field(default=4096)
+    embedding_cache_size: int = Field(default=1024)
+    embedding_batch_size: int = Field(default=16)
+    embedding_batch_wait_ms: float = Field(default=5.0)
 
 
 # ═══════════════════════════════════════════════
@@ -116,6 +131,7 @@ class Settings(BaseSettings):
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
+        frozen=True,
     )
 
     discord: DiscordConfig = Field(default_factory=DiscordConfig)
@@ -133,5 +149,6 @@ class Settings(BaseSettings):
     environment: str = Field(default="development")
 
 
+@lru_cache(maxsize=1)
 def load_settings() -> Settings:
     return Settings()
@@ -1,20 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import time
 from dataclasses import dataclass, field
 from typing import TYPE_CHECKING
 
+import discord
 import tiktoken
 import structlog
 
 from config import ContextConfig
+from core.router import CHITCHAT_UTTERANCES, IGNORE_UTTERANCES
 from database import memory_store, user_store
 from services import redis_client as rc
 
 if TYPE_CHECKING:
     import asyncpg
-    import discord
     from redis.asyncio import Redis
+    from core.embedding_batcher import EmbeddingBatcher
     from core.router import LocalRouter
 
 logger = structlog.get_logger("twomoon.context")
@@ -33,11 +36,53 @@ def count_tokens(text: str) -> int:
     return len(_get_encoder().encode(text, disallowed_special=()))
 
 
+def count_tokens_batch(texts: list[str]) -> list[int]:
+    encoded = _get_encoder().encode_ordinary_batch(texts)
+    return [len(tokens) for tokens in encoded]
+
+
+# Sections are emitted (and budgeted) highest priority first.
+SECTION_PRIORITY_ORDER = (5, 3, 2, 1)
+
+_TRIM_CHARS_PER_TOKEN = 8
+_TRIM_TOKEN_MARGIN = 32
+
+
+def _token_upper_bound(text: str) -> int:
+    # cl100k is byte-level BPE: every token covers at least one UTF-8 byte.
+    return len(text.encode("utf-8"))
+
+
+# ═══════════════════════════════════════════════
+# SEMANTIC RECALL GATE
+# ═══════════════════════════════════════════════
+
+SEMANTIC_SKIP_PHRASES: frozenset[str] = frozenset(
+    [*IGNORE_UTTERANCES, *CHITCHAT_UTTERANCES,
+     "ok cool", "ok thanks", "ok cool thanks", "thanks man", "thank you so much",
+     "lmao that's crazy", "lol that's crazy", "that's crazy", "no way", "same",
+     "true", "fair", "fair enough", "makes sense", "i see", "oh ok", "oh okay",
+     "good morning everyone", "good night everyone", "see you later", "see ya later"]
+)
+
+
+def worth_semantic_recall(content: str) -> bool:
+    if len(content) < 10:
+        return False
+    normalized = content.strip().lower()
+    if normalized in SEMANTIC_SKIP_PHRASES:
+        return False
+    # Mostly emoji / punctuation / mentions — nothing to recall against.
+    letters = sum(1 for c in normalized if c.isalpha())
+    visible = sum(1 for c in normalized if not c.isspace())
+    return letters * 2 >= visible
+
+
 # ═══════════════════════════════════════════════
 # CONTEXT DATA
 # ═══════════════════════════════════════════════
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MessageFragment:
     msg_id: str
     author: str
@@ -47,7 +92,7 @@ class MessageFragment:
     timestamp: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class AssembledContext:
     reply_chain: list[MessageFragment] = field(default_factory=list)
     semantic_results: list[dict] = field(default_factory=list)
@@ -55,13 +100,23 @@ class AssembledContext:
     memories: list[str] = field(default_factory=list)
     user_profile: dict | None = None
     language: str = "en"
-    active_users: dict[str, str] = field(default_factory=dict)
+    active_users: list[tuple[str, str]] = field(default_factory=list)
 
 
 # ═══════════════════════════════════════════════
 # CONTEXT MANAGER
 # ═══════════════════════════════════════════════
 
+_BUILD_STEPS = ("reply_chain", "channel_history", "recall", "user_profile")
+
+
+def _unwrap(step: str, result):
+    if isinstance(result, BaseException):
+        logger.error("context_step_failed", step=step, error=str(result))
+        return None
+    return result
+
+
 class ContextManager:
     def __init__(
         self,
@@ -69,42 +124,48 @@ class ContextManager:
         db_pool: asyncpg.Pool,
         redis: Redis,
         router: LocalRouter | None = None,
+        embedder: EmbeddingBatcher | None = None,
     ) -> None:
         self._config = config
         self._db = db_pool
         self._redis = redis
         self._router = router
+        self._embedder = embedder
+        self._history_refreshes: dict[str, asyncio.Task] = {}
 
     async def build(self, message: discord.Message) -> AssembledContext:
         start_time = time.perf_counter()
         ctx = AssembledContext()
 
-        # 1. Trace Reply Chain (Highest Priority Context)
-        ctx.reply_chain = await self._trace_reply_chain(message)
-
-        # 2. Get Recent Channel History (Immediate Context)
-        ctx.channel_history = await self._get_channel_history(message.channel, str(message.id))
-
-        # 3. Recall Explicit Memories (Facts about user)
-        ctx.memories = await memory_store.recall_memory(
-            self._db, message.author.id, message.content, limit=3,
+        # 1-5. Reply chain, channel history, memories + semantic recall and the
+        # user profile are independent — fetch them concurrently.
+        results = await asyncio.gather(
+            self._trace_reply_chain(message),
+            self._get_channel_history(message.channel, str(message.id)),
+            self._recall(message),
+            user_store.get_user(self._db, str(message.author.id)),
+            return_exceptions=True,
         )
-
-        # 4. Semantic Retrieval (Long-term Context)
-        raw_semantic = await self._semantic_retrieval(
-            message.channel.id, message.content,
+        reply_chain, history, recall, user_profile = (
+            _unwrap(name, result)
+            for name, result in zip(_BUILD_STEPS, results)
         )
+        memories, raw_semantic = recall or ([], [])
 
-        seen_ids = {msg.msg_id for msg in ctx.channel_history}
-        seen_ids.update(msg.msg_id for msg in ctx.reply_chain)
-        seen_ids.add(str(message.id))
+        ctx.reply_chain = reply_chain or []
+        ctx.channel_history = history or []
+        ctx.memories = memories
 
         unique_semantic = []
-        for res in raw_semantic:
-            res_id = str(res.get("message_id") or res.get("id"))
-
-            if res_id not in seen_ids:
-                unique_semantic.append(res)
+        if raw_semantic:
+            seen_ids = {msg.msg_id for msg in ctx.channel_history}
+            seen_ids.update(msg.msg_id for msg in ctx.reply_chain)
+            seen_ids.add(str(message.id))
+
+            unique_semantic = [
+                res for res in raw_semantic
+                if res.get("message_id") not in seen_ids
+            ]
 
         unique_semantic.sort(key=lambda x: x.get("timestamp", 0))
 
@@ -118,13 +179,15 @@ class ContextManager:
             time_ms=round((time.perf_counter() - start_time) * 1000, 2)
         )
 
-        # 5. Build User Profile & Active Users
-        ctx.user_profile = await user_store.get_user(self._db, str(message.author.id))
+        # 6. User Profile & Active Users
+        ctx.user_profile = user_profile
         ctx.language = ctx.user_profile["preferred_lang"] if ctx.user_profile else "en"
 
+        seen_authors: set[str] = set()
         for msg in ctx.channel_history:
-            if not msg.is_bot:
-                ctx.active_users[msg.author_id] = msg.author
+            if not msg.is_bot and msg.author_id not in seen_authors:
+                seen_authors.add(msg.author_id)
+                ctx.active_users.append((msg.author_id, msg.author))
 
         return ctx
 
@@ -134,13 +197,13 @@ class ContextManager:
         message: discord.Message,
         token_budget: int = 2500,
     ) -> str:
-        sections: list[tuple[str, str, int]] = []
-        # (label, content, priority) — lower priority number = trimmed first
+        sections: dict[int, list[tuple[str, str]]] = {p: [] for p in SECTION_PRIORITY_ORDER}
+        # priority -> [(label, content)] — lower priority number = trimmed first
 
         # ─── Memories (priority 2 — trim second) ───
         if context.memories:
             mem_text = "\n".join(f"- {m[:100]}" for m in context.memories)
-            sections.append(("[MEMORIES]", mem_text, 2))
+            sections[2].append(("[MEMORIES]", mem_text))
 
         # ─── Semantic Recall (priority 3 — trim third) ───
         if context.semantic_results:
@@ -149,7 +212,7 @@ class ContextManager:
                 role = "Bot" if r["is_bot"] else f"user_{str(r['user_id'])[:6]}"
                 sem_lines.append(f"{role}: {r['content'][:150]}")
             sem_text = "\n".join(sem_lines)
-            sections.append(("[SEMANTIC RECALL]", sem_text, 3))
+            sections[3].append(("[SEMANTIC RECALL]", sem_text))
 
         # ─── Reply Chain (priority 5 — NEVER trim) ───
         if context.reply_chain:
@@ -158,7 +221,7 @@ class ContextManager:
                 role = "Bot" if msg.is_bot else msg.author
                 chain_lines.append(f"{role}: {msg.content[:200]}")
             chain_text = "\n".join(chain_lines)
-            sections.append(("[REPLY CONTEXT]", chain_text, 5))
+            sections[5].append(("[REPLY CONTEXT]", chain_text))
 
         # ─── Channel History (priority 1 — trim first) ───
         if context.channel_history:
@@ -168,21 +231,34 @@ class ContextManager:
                 role = "Bot" if msg.is_bot else msg.author
                 hist_lines.append(f"{role}: {msg.content[:150]}")
             hist_text = "\n".join(hist_lines)
-            sections.append(("[RECENT CHAT]", hist_text, 1))
+            sections[1].append(("[RECENT CHAT]", hist_text))
 
         # ─── Current Message (priority 5 — NEVER trim) ───
         current_text = f"{message.author.display_name}: {message.content}"
-        sections.append(("[CURRENT]", current_text, 5))
+        sections[5].append(("[CURRENT]", current_text))
 
         # ─── Token Budget Enforcement ───
-        sections.sort(key=lambda s: s[2], reverse=True)
+        blocks = [
+            (f"{label}\n{content}", priority)
+            for priority in SECTION_PRIORITY_ORDER
+            for label, content in sections[priority]
+        ]
 
         final_parts = []
         used_tokens = 0
-
-        for label, content, priority in sections:
-            block = f"{label}\n{content}"
-            block_tokens = count_tokens(block)
+        exact_counts: list[int] | None = None
+
+        for index, (block, priority) in enumerate(blocks):
+            # Cheap byte-length upper bound first; once the bound says we might
+            # be near the budget, tokenize every block in one batch call.
+            if exact_counts is not None:
+                block_tokens = exact_counts[index]
+            else:
+                block_tokens = _token_upper_bound(block)
+                if used_tokens + block_tokens > token_budget:
+                    exact_counts = count_tokens_batch([b for b, _ in blocks])
+                    used_tokens = sum(exact_counts[:index])
+                    block_tokens = exact_counts[index]
 
             if used_tokens + block_tokens > token_budget and priority < 5:
                 remaining = token_budget - used_tokens
@@ -200,7 +276,7 @@ class ContextManager:
     def build_mention_map(self, context: AssembledContext) -> str:
         if not context.active_users:
             return ""
-        lines = [f"{name} = <@{uid}>" for uid, name in context.active_users.items()]
+        lines = [f"{name} = <@{uid}>" for uid, name in context.active_users]
         return "[USER LIST]\n" + "\n".join(lines)
 
     # ═══════════════════════════════════════════
@@ -217,11 +293,16 @@ class ContextManager:
 
         while current.reference and current.reference.message_id and depth < max_depth:
             try:
-                if current.reference.cached_message:
-                    parent = current.reference.cached_message
+                reference = current.reference
+                # A fetched reply already embeds its parent (`referenced_message`),
+                # so every API call resolves two hops instead of one.
+                if reference.cached_message:
+                    parent = reference.cached_message
+                elif isinstance(reference.resolved, discord.Message):
+                    parent = reference.resolved
                 else:
-                    parent = await current.channel.fetch_message(current.reference.message_id)
-                
+                    parent = await current.channel.fetch_message(reference.message_id)
+
                 chain.append(MessageFragment(
                     msg_id=str(parent.id),
                     author=parent.author.display_name,
@@ -248,19 +329,32 @@ class ContextManager:
     ) -> list[MessageFragment]:
         cached = await rc.get_context(self._redis, str(channel.id))
         if cached:
+            fetched_at, rows = cached
+            if time.time() - fetched_at > self._config.history_refresh_after_seconds:
+                self._schedule_history_refresh(channel, exclude_id)
             return [
-                MessageFragment(
-                    msg_id=m.get("id", ""),
-                    author=m["author"],
-                    author_id=m["author_id"],
-                    content=m["content"],
-                    is_bot=m["is_bot"],
-                    timestamp=m.get("timestamp", 0),
-                )
-                for m in cached
-                if m.get("id") != exclude_id
+                MessageFragment(*row)
+                for row in rows
+                if row[0] != exclude_id
             ]
 
+        return await self._fetch_channel_history(channel, exclude_id)
+
+    def _schedule_history_refresh(self, channel: discord.TextChannel, exclude_id: str) -> None:
+        # Stale-while-revalidate: serve the cached copy, refresh in the background,
+        # at most one refresh in flight per channel.
+        channel_key = str(channel.id)
+        if channel_key in self._history_refreshes:
+            return
+        task = asyncio.create_task(self._fetch_channel_history(channel, exclude_id))
+        self._history_refreshes[channel_key] = task
+        task.add_done_callback(lambda _: self._history_refreshes.pop(channel_key, None))
+
+    async def _fetch_channel_history(
+        self,
+        channel: discord.TextChannel,
+        exclude_id: str,
+    ) -> list[MessageFragment]:
         try:
             messages = [message async for message in channel.history(limit=self._config.history_limit)]
         except Exception as error:
@@ -268,64 +362,79 @@ class ContextManager:
             return []
 
         history = []
-        cache_data = []
 
         for m in reversed(messages):
             if str(m.id) == exclude_id:
                 continue
-            
+
             if not m.content.strip():
                 continue
 
-            frag = MessageFragment(
+            history.append(MessageFragment(
                 msg_id=str(m.id),
                 author=m.author.display_name,
                 author_id=str(m.author.id),
                 content=m.content,
                 is_bot=m.author.bot,
                 timestamp=m.created_at.timestamp(),
-            )
-            history.append(frag)
-            cache_data.append({
-                "id": str(m.id),
-                "author": m.author.display_name,
-                "author_id": str(m.author.id),
-                "content": m.content,
-                "is_bot": m.author.bot,
-                "timestamp": m.created_at.timestamp(),
-            })
-
-        await rc.set_context(self._redis, str(channel.id), cache_data, ttl_seconds=120)
+            ))
+
+        # Cached positionally (field order of MessageFragment): no per-field
+        # key lookups on decode and a smaller payload.
+        rows = [
+            (f.msg_id, f.author, f.author_id, f.content, f.is_bot, f.timestamp)
+            for f in history
+        ]
+        await rc.set_context(self._redis, str(channel.id), [time.time(), rows], ttl_seconds=120)
         return history
 
     # ═══════════════════════════════════════════
-    # SEMANTIC RETRIEVAL (Vector Search)
+    # MEMORY RECALL + SEMANTIC RETRIEVAL (Vector Search)
     # ═══════════════════════════════════════════
 
-    async def _semantic_retrieval(
-        self,
-        channel_id: str | int,
-        content: str,
-    ) -> list[dict]:
-        if not self._router or not content or len(content) < 10:
-            return []
+    async def _recall(self, message: discord.Message) -> tuple[list[str], list[dict]]:
+        content = message.content
+        embedding = None
+        if self._router and content and worth_semantic_recall(content):
+            try:
+                embedding = await self._embed(content)
+            except Exception as error:
+                logger.error("semantic_retrieval_failed", error=str(error))
+
+        if embedding is None:
+            memories = await memory_store.recall_memory(self._db, message.author.id, content, limit=3)
+            return memories, []
+
+        # Both lookups share one connection and one round-trip.
+        return await memory_store.recall_and_search(
+            pool=self._db,
+            user_id=message.author.id,
+            current_content=content,
+            channel_id=message.channel.id,
+            query_embedding=embedding,
+            window_hours=self._config.semantic_retrieval_window_hours,
+            memory_limit=3,
+            search_limit=self._config.semantic_retrieval_limit,
+        )
 
-        try:
-            embedding = self._router.get_embedding(content)
-            if embedding is None:
-                return []
-
-            results = await memory_store.semantic_search(
-                pool=self._db,
-                channel_id=str(channel_id),
-                query_embedding=embedding,
-                window_hours=self._config.semantic_retrieval_window_hours,
-                limit=self._config.semantic_retrieval_limit,
-            )
-            return results
-        except Exception as error:
-            logger.error("semantic_retrieval_failed", error=str(error))
-            return []
+    async def _embed(self, content: str) -> list[float] | None:
+        # In-process LRU first, then Redis; only a miss in both pays for
+        # inference, and only a fresh encode is written back to Redis.
+        cached = self._router.cached_embedding(content)
+        if cached is not None:
+            return cached
+        cached = await rc.get_embedding(self._redis, content)
+        if cached is not None:
+            return cached
+
+        # Inference is CPU-bound; keep it off the event loop.
+        if self._embedder is not None:
+            embedding = await self._embedder.embed(content)
+        else:
+            embedding = await asyncio.to_thread(self._router.get_embedding, content)
+        if embedding is not None:
+            await rc.set_embedding(self._redis, content, embedding)
+        return embedding
 
     # ═══════════════════════════════════════════
     # TOKEN TRIMMING
@@ -333,9 +442,16 @@ class ContextManager:
 
     @staticmethod
     def _trim_to_tokens(text: str, max_tokens: int) -> str:
-        encoder = _get_encoder()
-        tokens = encoder.encode(text, disallowed_special=())
+        # Long inputs: encode a generous prefix only. BPE output can differ
+        # only around the cut, so a margin of spare tokens keeps the kept
+        # prefix identical to encoding the whole text.
+        head_chars = max_tokens * _TRIM_CHARS_PER_TOKEN
+        if len(text) > head_chars:
+            head_tokens = _get_encoder().encode(text[:head_chars], disallowed_special=())
+            if len(head_tokens) > max_tokens + _TRIM_TOKEN_MARGIN:
+                return _get_encoder().decode(head_tokens[:max_tokens])
+
+        tokens = _get_encoder().encode(text, disallowed_special=())
         if len(tokens) <= max_tokens:
             return text
-        trimmed_tokens = tokens[:max_tokens]
-        return encoder.decode(trimmed_tokens)
\ No newline at end of file
+        return _get_encoder().decode(tokens[:max_tokens])
\ No newline at end of file
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+import structlog
+
+if TYPE_CHECKING:
+    from core.router import LocalRouter
+
+logger = structlog.get_logger("twomoon.embedding_batcher")
+
+
+# ═══════════════════════════════════════════════
+# EMBEDDING BATCHER (micro-batching queue)
+# ═══════════════════════════════════════════════
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        router: LocalRouter,
+        max_batch: int = 16,
+        max_wait_seconds: float = 0.005,
+    ) -> None:
+        self._router = router
+        self._max_batch = max_batch
+        self._max_wait = max_wait_seconds
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+
+    async def embed(self, text: str) -> list[float] | None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        # Anything still queued would otherwise leave its embed() caller hanging.
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            _fail_closed(future)
+
+    # ═══════════════════════════════════════════
+    # WORKER
+    # ═══════════════════════════════════════════
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                deadline = loop.time() + self._max_wait
+
+                while len(batch) < self._max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+                texts = [text for text, _ in batch]
+                try:
+                    vectors = await asyncio.to_thread(self._router.get_embeddings_batch, texts)
+                except Exception as error:
+                    logger.error("embedding_batch_failed", error=str(error), size=len(texts))
+                    vectors = [None] * len(texts)
+
+                for (_, future), vector in zip(batch, vectors):
+                    if not future.done():
+                        future.set_result(vector)
+            except asyncio.CancelledError:
+                # Cancelled by close() mid-batch: release the callers already collected.
+                for _, future in batch:
+                    _fail_closed(future)
+                raise
+
+            logger.debug("embedding_batch_flushed", size=len(texts))
+
+
+def _fail_closed(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_exception(RuntimeError("embedding batcher closed"))
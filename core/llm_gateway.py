@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-from typing import TypeVar
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable, TypeVar
 
+import httpx
 import instructor
 import structlog
 from groq import AsyncGroq
@@ -17,6 +21,12 @@ from services import redis_client as rc
 logger = structlog.get_logger("twomoon.gateway")
 
 T = TypeVar("T", bound=BaseModel)
+R = TypeVar("R")
+
+CIRCUIT_LOCAL_TTL_SECONDS = 0.5
+
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 100
 
 
 # ═══════════════════════════════════════════════
@@ -47,22 +57,37 @@ class LLMGateway:
         self._redis = redis
         self._cb_fail_max = settings.circuit_breaker.fail_max
         self._cb_reset_timeout = settings.circuit_breaker.reset_timeout_seconds
+        self._local_circuit: dict[str, tuple[str, float]] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+
+        # One keep-alive pool shared by all four SDK clients; the SDK default
+        # pools are small and separate, so bursts paid for fresh TLS handshakes.
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
 
-        self._groq = GroqClient(settings.groq)
-        self._openrouter = OpenRouterClient(settings.openrouter)
+        self._groq = GroqClient(settings.groq, http_client=self._http)
+        self._openrouter = OpenRouterClient(settings.openrouter, http_client=self._http)
 
         self._groq_instructor = instructor.from_groq(
-            AsyncGroq(api_key=settings.groq.api_key),
+            AsyncGroq(api_key=settings.groq.api_key, http_client=self._http),
             mode=instructor.Mode.JSON,
         )
         self._openrouter_instructor = instructor.from_openai(
             AsyncOpenAI(
                 api_key=settings.openrouter.api_key,
                 base_url=settings.openrouter.base_url,
+                http_client=self._http,
             ),
             mode=instructor.Mode.JSON,
         )
 
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
     # ═══════════════════════════════════════════
     # MAIN CHAT — Structured Output (1 call = think + generate)
     # ═══════════════════════════════════════════
@@ -74,6 +99,18 @@ class LLMGateway:
         max_tokens: int = 150,
         temperature: float = 0.85,
     ) -> ChatResponse:
+        key = _flight_key("chat", system_prompt, user_content, max_tokens, temperature)
+        return await self._single_flight(
+            key, lambda: self._generate_chat(system_prompt, user_content, max_tokens, temperature),
+        )
+
+    async def _generate_chat(
+        self,
+        system_prompt: str,
+        user_content: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> ChatResponse:
 
         # ─── Try Groq ───
         if not await self._is_circuit_open("groq"):
@@ -154,6 +191,18 @@ class LLMGateway:
         max_tokens: int = 80,
         temperature: float = 0.9,
     ) -> LLMResponse:
+        key = _flight_key("text", system_prompt, user_content, max_tokens, temperature)
+        return await self._single_flight(
+            key, lambda: self._generate_text(system_prompt, user_content, max_tokens, temperature),
+        )
+
+    async def _generate_text(
+        self,
+        system_prompt: str,
+        user_content: str,
+        max_tokens: int,
+        temperature: float,
+    ) -> LLMResponse:
 
         # ─── Try Groq ───
         if not await self._is_circuit_open("groq"):
@@ -184,17 +233,28 @@ class LLMGateway:
         logger.error("all_providers_down_text")
         return LLMResponse(success=False, error="all_down", provider="none")
 
+    # ═══════════════════════════════════════════
+    # SINGLE-FLIGHT
+    # ═══════════════════════════════════════════
+
+    async def _single_flight(self, key: str, call: Callable[[], Awaitable[R]]) -> R:
+        # Identical concurrent requests share one provider call (and one round
+        # of circuit-breaker bookkeeping); the entry lives only while in flight.
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
     # ═══════════════════════════════════════════
     # PROVIDER STATUS (for /status command)
     # ═══════════════════════════════════════════
 
     async def get_provider_status(self) -> dict:
-        groq_state = await rc.get_circuit_state(self._redis, "groq")
-        openrouter_state = await rc.get_circuit_state(self._redis, "openrouter")
-        return {
-            "groq": {"circuit": groq_state},
-            "openrouter": {"circuit": openrouter_state},
-        }
+        # Breaker state already lives in Redis; read both keys in one round-trip.
+        states = await rc.get_circuit_states(self._redis, ["groq", "openrouter"])
+        return {provider: {"circuit": state} for provider, state in states.items()}
 
     # ═══════════════════════════════════════════
     # INSTRUCTOR WRAPPER
@@ -212,11 +272,9 @@ class LLMGateway:
         temperature: float,
         timeout: float,
     ) -> T | None:
-        import asyncio
-
         try:
-            result = await asyncio.wait_for(
-                client.chat.completions.create(
+            async with asyncio.timeout(timeout):
+                result = await client.chat.completions.create(
                     model=model,
                     response_model=response_model,
                     messages=[
@@ -226,9 +284,7 @@ class LLMGateway:
                     max_tokens=max_tokens,
                     temperature=temperature,
                     max_retries=1,
-                ),
-                timeout=timeout,
-            )
+                )
             logger.debug(
                 "instructor_success",
                 provider=provider,
@@ -253,28 +309,41 @@ class LLMGateway:
     # ═══════════════════════════════════════════
 
     async def _is_circuit_open(self, provider: str) -> bool:
-        state = await rc.get_circuit_state(self._redis, provider)
+        now = time.monotonic()
+        cached = self._local_circuit.get(provider)
+        if cached is not None and now < cached[1]:
+            state = cached[0]
+        else:
+            state = await rc.get_circuit_state(self._redis, provider)
+            self._local_circuit[provider] = (state, now + CIRCUIT_LOCAL_TTL_SECONDS)
+
         if state == "open":
             logger.debug("circuit_open_skipping", provider=provider)
             return True
         return False
 
     async def _record_success(self, provider: str) -> None:
-        await rc.reset_circuit_failures(self._redis, provider)
-        current_state = await rc.get_circuit_state(self._redis, provider)
-        if current_state != "closed":
-            await rc.set_circuit_state(self._redis, provider, "closed")
+        self._local_circuit.pop(provider, None)
+        if await rc.record_circuit_success(self._redis, provider):
             logger.info("circuit_closed", provider=provider)
 
     async def _record_failure(self, provider: str) -> None:
-        count = await rc.increment_circuit_failures(self._redis, provider)
+        self._local_circuit.pop(provider, None)
+        count = await rc.record_circuit_failure(
+            self._redis, provider, self._cb_fail_max, self._cb_reset_timeout,
+        )
         if count >= self._cb_fail_max:
-            await rc.set_circuit_state(
-                self._redis, provider, "open", ttl_seconds=self._cb_reset_timeout,
-            )
             logger.warning(
                 "circuit_opened",
                 provider=provider,
                 failures=count,
                 reset_in=self._cb_reset_timeout,
-            )
\ No newline at end of file
+            )
+
+
+def _flight_key(kind: str, system_prompt: str, user_content: str, max_tokens: int, temperature: float) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (kind, system_prompt, user_content, str(max_tokens), str(temperature)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import asyncio
 import re
-from datetime import datetime, timezone
+import time
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
 
 import asyncpg
 import structlog
@@ -11,6 +15,8 @@ from database import persona_store
 
 logger = structlog.get_logger("twomoon.persona")
 
+STYLE_OFFLOAD_CHARS = 2000
+
 
 # ═══════════════════════════════════════════════
 # BASE IDENTITY — 2M_Gumiho
@@ -68,45 +74,56 @@ User: "1+1?" -> {"should_respond": true, "response_text": "2", "mood": "neutral"
 # PERSONA MODIFIERS
 # ═══════════════════════════════════════════════
 
-PERSONA_MODS = {
+PERSONA_MODS: Mapping[str, str] = MappingProxyType({
     "twomoon": "\nPersonality: Calm, composed, balanced between serious and chill. Default Two Moon energy.",
     "homie": "\nPersonality: Super relaxed, jokes around, supportive friend vibes. Uses more slang.",
     "mentor": "\nPersonality: Wise but not preachy, gives insights not lectures. Can be philosophical.",
     "chaos": "\nPersonality: Chaotic energy, roasts often, unpredictable, savage humor. No filter.",
     "professional": "\nPersonality: More formal but still not robotic. Structured responses, less slang.",
     "matchuser": "",
-}
+})
 
-PRESET_EMOJI = {
+PRESET_EMOJI: Mapping[str, str] = MappingProxyType({
     "twomoon": "🌙",
     "homie": "😎",
     "mentor": "🧙",
     "chaos": "🔥",
     "professional": "💼",
     "matchuser": "🪞",
-}
+})
 
-PRESET_DESC = {
+PRESET_DESC: Mapping[str, str] = MappingProxyType({
     "twomoon": "Calm, balanced, Two Moon presence",
     "homie": "Chill, playful, your buddy",
     "mentor": "Wise, thoughtful",
     "chaos": "Savage, unhinged",
     "professional": "Formal, serious",
     "matchuser": "Mirrors your style",
-}
+})
 
 
 # ═══════════════════════════════════════════════
 # TIME CONTEXT
 # ═══════════════════════════════════════════════
 
+LATE_NIGHT_CONTEXT = '\n[Its late night/early morning. You can comment on it if natural like "still up?" or "go sleep"]'
+NIGHT_CONTEXT = "\n[Its nighttime]"
+
+
+# Indexed by UTC hour: 00-04 late night, 05-21 nothing, 22-23 night.
+_HOUR_CONTEXT: tuple[str, ...] = (LATE_NIGHT_CONTEXT,) * 5 + ("",) * 17 + (NIGHT_CONTEXT,) * 2
+
+
 def _time_context() -> str:
-    hour = datetime.now(timezone.utc).hour
-    if 0 <= hour < 5:
-        return '\n[Its late night/early morning. You can comment on it if natural like "still up?" or "go sleep"]'
-    if hour >= 22:
-        return "\n[Its nighttime]"
-    return ""
+    return _HOUR_CONTEXT[time.gmtime().tm_hour]
+
+
+# Every (preset, time context) head of the prompt, concatenated once at import.
+_PROMPT_HEADS: dict[tuple[str, str], str] = {
+    (preset, time_context): BASE_PROMPT + time_context + mod
+    for preset, mod in PERSONA_MODS.items()
+    for time_context in ("", NIGHT_CONTEXT, LATE_NIGHT_CONTEXT)
+}
 
 
 # ═══════════════════════════════════════════════
@@ -120,6 +137,35 @@ CULTURE_MARKERS = {
     "indo_slang": ["gw", "gue", "lu", "lo", "anjir", "bangsat", "cuk", "wkwk", "awkwk", "dong", "sih", "deh", "nih", "mager"],
 }
 
+# Every culture marker in one lookahead alternation (longest first), so a single
+# pass over the text finds all of them. Each marker owns one bit (its index in
+# its culture's list); a match ORs in its own bit plus the bits of any markers
+# that are its prefixes, since those are hidden by the longer match.
+_MARKER_BITS: dict[str, list[tuple[str, int]]] = {}
+for _culture, _markers in CULTURE_MARKERS.items():
+    for _index, _marker in enumerate(_markers):
+        _MARKER_BITS.setdefault(_marker, []).append((_culture, 1 << _index))
+
+_MARKER_MASKS: dict[str, tuple[tuple[str, int], ...]] = {}
+for _marker in _MARKER_BITS:
+    _masks: dict[str, int] = {}
+    for _other, _bits in _MARKER_BITS.items():
+        if _marker.startswith(_other):
+            for _culture, _bit in _bits:
+                _masks[_culture] = _masks.get(_culture, 0) | _bit
+    _MARKER_MASKS[_marker] = tuple(_masks.items())
+
+_MARKER_RE = re.compile(
+    "(?=("
+    + "|".join(re.escape(m) for m in sorted(_MARKER_BITS, key=len, reverse=True))
+    + "))"
+)
+
+_FORMAL_RE = re.compile(r"please|thank you|could you|would you|kindly", re.IGNORECASE)
+_CASUAL_RE = re.compile(r"gw|lu|anjir|lol|bruh|yo|bro|dude")
+_UPPERCASE_RUN_RE = re.compile(r"[A-Z]{4,}")
+_HUMOR_RE = re.compile(r"wkwk|haha|lol|lmao|😂|💀|xd")
+
 
 def analyze_style(messages: list[str]) -> dict:
     if not messages:
@@ -130,13 +176,15 @@ def analyze_style(messages: list[str]) -> dict:
     avg_len = len(combined) / max(len(messages), 1)
 
     formality = "neutral"
-    if re.search(r"please|thank you|could you|would you|kindly", combined, re.IGNORECASE):
+    if _FORMAL_RE.search(combined):
         formality = "formal"
-    elif re.search(r"gw|lu|anjir|lol|bruh|yo|bro|dude", lower):
+    elif _CASUAL_RE.search(lower):
         formality = "casual"
 
     energy = "medium"
-    if re.search(r"!{2,}|[A-Z]{4,}", combined):
+    # "!!" is a plain substring test; the uppercase-run regex only runs when
+    # lowercasing changed something, i.e. the text has capitals at all.
+    if "!!" in combined or (lower != combined and _UPPERCASE_RUN_RE.search(combined)):
         energy = "high"
     elif avg_len < 15:
         energy = "low"
@@ -148,15 +196,15 @@ def analyze_style(messages: list[str]) -> dict:
         verbosity = "brief"
 
     humor = "subtle"
-    if re.search(r"wkwk|haha|lol|lmao|😂|💀|xd", lower):
+    if _HUMOR_RE.search(lower):
         humor = "playful"
 
-    culture = None
-    for name, markers in CULTURE_MARKERS.items():
-        matches = sum(1 for m in markers if m in lower)
-        if matches >= 2:
-            culture = name
-            break
+    culture_masks = dict.fromkeys(CULTURE_MARKERS, 0)
+    for marker in set(_MARKER_RE.findall(lower)):
+        for name, bits in _MARKER_MASKS[marker]:
+            culture_masks[name] |= bits
+
+    culture = next((name for name, mask in culture_masks.items() if mask.bit_count() >= 2), None)
 
     return {
         "formality": formality,
@@ -213,29 +261,51 @@ async def build_system_prompt(
     language: str = "en",
     mention_map: str = "",
     talking_to: str = "",
+    persona: dict | None = None,
 ) -> str:
-    persona = await persona_store.get_effective_persona(pool, redis, user_id, server_id)
-
-    prompt = BASE_PROMPT
-    prompt += _time_context()
-    prompt += PERSONA_MODS.get(persona["preset"], PERSONA_MODS["twomoon"])
+    if persona is None:
+        persona = await persona_store.get_effective_persona(pool, redis, user_id, server_id)
+
+    preset = persona["preset"]
+    style_messages = tuple(user_messages) if preset == "matchuser" and user_messages else ()
+
+    args = (preset, _time_context(), style_messages, mention_map, talking_to, language)
+
+    # Style analysis over a long sample is CPU-bound: keep it off the event loop.
+    if sum(map(len, style_messages)) > STYLE_OFFLOAD_CHARS:
+        return await asyncio.to_thread(_assemble_prompt, *args)
+    return _assemble_prompt(*args)
+
+
+# Pure function of its inputs, so repeat turns (same persona, hour bucket,
+# style sample and user list) reuse the finished string.
+@lru_cache(maxsize=256)
+def _assemble_prompt(
+    preset: str,
+    time_context: str,
+    style_messages: tuple[str, ...],
+    mention_map: str,
+    talking_to: str,
+    language: str,
+) -> str:
+    parts = [_PROMPT_HEADS[(preset, time_context)]]
 
-    if persona["preset"] == "matchuser" and user_messages:
-        style = analyze_style(user_messages)
-        prompt += "\n\n" + style_to_prompt(style)
+    if style_messages:
+        style = analyze_style(list(style_messages))
+        parts.append("\n\n" + style_to_prompt(style))
 
     if mention_map:
-        prompt += f"\n\n[USER LIST — use <@ID> to mention]\n{mention_map}"
+        parts.append(f"\n\n[USER LIST — use <@ID> to mention]\n{mention_map}")
 
     if talking_to:
-        prompt += f"\nTalking to: {talking_to}"
+        parts.append(f"\nTalking to: {talking_to}")
 
     if language == "id":
-        prompt += "\n[Language: respond in Indonesian]"
+        parts.append("\n[Language: respond in Indonesian]")
     elif language == "ja":
-        prompt += "\n[Language: respond in Japanese]"
+        parts.append("\n[Language: respond in Japanese]")
 
-    return prompt
+    return "".join(parts)
 
 
 # ═══════════════════════════════════════════════
@@ -1,18 +1,28 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import random
+import re
+import tempfile
+import threading
+from collections import OrderedDict
 from enum import Enum
+from pathlib import Path
 from typing import TYPE_CHECKING
 
+import numpy as np
 import structlog
-from semantic_router import Route, RouteLayer
 from semantic_router.encoders import FastEmbedEncoder
 
 if TYPE_CHECKING:
     from config import RouterConfig
+    from core.embedding_batcher import EmbeddingBatcher
 
 logger = structlog.get_logger("twomoon.router")
 
+LONG_MESSAGE_CONFIDENCE = 0.6
+
 
 # ═══════════════════════════════════════════════
 # ROUTE TYPES
@@ -82,33 +92,54 @@ LLM_REQUIRED_UTTERANCES = [
     "recommend me something",
 ]
 
+# Exact training utterances need no embedding: map them straight to their route.
+EXACT_UTTERANCE_ROUTES: dict[str, RouteType] = {
+    **{u.lower(): RouteType.LLM_REQUIRED for u in LLM_REQUIRED_UTTERANCES},
+    **{u.lower(): RouteType.CHITCHAT for u in CHITCHAT_UTTERANCES},
+    **{u.lower(): RouteType.IGNORE for u in IGNORE_UTTERANCES},
+}
+
+# Emoji (plus variation selectors / ZWJ) and whitespace only.
+_EMOJI_ONLY_RE = re.compile(r"[\U0001F300-\U0001FAFF\U00002600-\U000027BF\uFE0F\u200D\s]+")
+
+
+def _is_noise(cleaned: str) -> bool:
+    # Checked after the exact-utterance table, so "hi", "yo", "gm" etc. still
+    # reach CHITCHAT; anything else this short is noise.
+    return len(cleaned) <= 2 or _EMOJI_ONLY_RE.fullmatch(cleaned) is not None
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
 
 # ═══════════════════════════════════════════════
 # CHITCHAT RESPONSE TEMPLATES
 # ═══════════════════════════════════════════════
 
-CHITCHAT_RESPONSES = {
-    "greeting": [
+CHITCHAT_RESPONSES: dict[str, tuple[str, ...]] = {
+    "greeting": (
         "yo", "hey", "sup", "hello", "yo wassup", "oi"
-    ],
-    "greeting_morning": [
+    ),
+    "greeting_morning": (
         "gm", "morning", "good morning", "rise and shine"
-    ],
-    "greeting_night": [
+    ),
+    "greeting_night": (
         "night", "gn", "good night", "nite", "sleep well"
-    ],
-    "how_are_you": [
+    ),
+    "how_are_you": (
         "chillin, you?", "vibing", "fine", "same old", "good good"
-    ],
-    "thanks": [
+    ),
+    "thanks": (
         "np", "no prob", "sure", "anytime", "yw"
-    ],
-    "bye": [
+    ),
+    "bye": (
         "see ya", "bye", "later", "peace", "cya"
-    ],
-    "whats_up": [
+    ),
+    "whats_up": (
         "nothing much", "chillin", "just existing", "bored", "vibing"
-    ],
+    ),
 }
 
 GREETING_KEYWORDS = {"hi", "hello", "hey", "yo", "sup"}
@@ -127,32 +158,99 @@ WHATS_UP_KEYWORDS = {"whats up", "what's up", "wassup"}
 class LocalRouter:
     def __init__(self, config: RouterConfig) -> None:
         self._config = config
-        self._route_layer: RouteLayer | None = None
         self._encoder: FastEmbedEncoder | None = None
         self._ready = False
+        # Unit-normalized utterance embeddings, one row per training utterance.
+        self._utterance_matrix: np.ndarray | None = None
+        self._utterance_routes: list[RouteType] = []
+        self._embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._embedding_cache_lock = threading.Lock()
+        self._classify_cache: OrderedDict[str, tuple[RouteType, float]] = OrderedDict()
 
     async def initialize(self) -> None:
+        if self._ready:
+            return
+
         try:
-            self._encoder = FastEmbedEncoder(model_name=self._config.embedding_model)
+            # fastembed serves BAAI/bge-small-en-v1.5 from Qdrant's int8-quantized
+            # ONNX export; threads caps ONNX Runtime's intra-op pool.
+            self._encoder = FastEmbedEncoder(
+                name=self._config.embedding_model,
+                threads=self._config.embedding_threads,
+            )
 
-            routes = [
-                Route(name=RouteType.IGNORE, utterances=IGNORE_UTTERANCES),
-                Route(name=RouteType.CHITCHAT, utterances=CHITCHAT_UTTERANCES),
-                Route(name=RouteType.LLM_REQUIRED, utterances=LLM_REQUIRED_UTTERANCES),
-            ]
+            routes = (
+                (RouteType.IGNORE, IGNORE_UTTERANCES),
+                (RouteType.CHITCHAT, CHITCHAT_UTTERANCES),
+                (RouteType.LLM_REQUIRED, LLM_REQUIRED_UTTERANCES),
+            )
+            utterances = [u for _, route_utterances in routes for u in route_utterances]
 
-            self._route_layer = RouteLayer(encoder=self._encoder, routes=routes)
+            self._utterance_matrix = self._load_utterance_matrix(utterances)
+            self._utterance_routes = [
+                route for route, route_utterances in routes for _ in route_utterances
+            ]
             self._ready = True
             logger.info("gatekeeper_ready", model=self._config.embedding_model)
         except Exception as error:
             logger.error("gatekeeper_init_failed", error=str(error))
             self._ready = False
 
+    def _load_utterance_matrix(self, utterances: list[str]) -> np.ndarray:
+        # The matrix is a pure function of (model, utterances): reuse the copy
+        # saved by a previous boot instead of re-encoding.
+        cache_dir = self._config.utterance_cache_dir
+        path = None
+        if cache_dir:
+            digest = hashlib.sha1(
+                "\0".join([self._config.embedding_model, *utterances]).encode("utf-8")
+            ).hexdigest()
+            path = Path(cache_dir) / f"utterances_{digest}.npy"
+            if path.exists():
+                try:
+                    cached = np.load(path, mmap_mode="r")
+                    if self._utterance_cache_valid(cached, len(utterances)):
+                        return cached
+                    logger.warning("utterance_cache_mismatch", path=str(path), shape=cached.shape)
+                except Exception as error:
+                    logger.warning("utterance_cache_load_failed", path=str(path), error=str(error))
+
+        matrix = np.asarray(self._encoder(docs=utterances), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+        if path is not None:
+            tmp_name = None
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # Write beside the target and rename over it, so a crash or a
+                # concurrent boot never leaves a half-written matrix in place.
+                with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as tmp:
+                    tmp_name = tmp.name
+                    np.save(tmp, matrix)
+                os.replace(tmp_name, path)
+            except Exception as error:
+                logger.warning("utterance_cache_save_failed", path=str(path), error=str(error))
+                if tmp_name is not None:
+                    Path(tmp_name).unlink(missing_ok=True)
+        return matrix
+
+    def _utterance_cache_valid(self, cached: np.ndarray, rows: int) -> bool:
+        if cached.dtype != np.float32 or cached.ndim != 2 or cached.shape[0] != rows:
+            return False
+        # One short encode pins the model's output width.
+        probe = self._encoder(docs=["hi"])
+        return cached.shape[1] == len(probe[0])
+
     @property
     def encoder(self) -> FastEmbedEncoder | None:
         return self._encoder
 
-    def classify(self, content: str, has_image: bool = False) -> RouteResult:
+    def classify(
+        self,
+        content: str,
+        has_image: bool = False,
+        vector: list[float] | None = None,
+    ) -> RouteResult:
         if has_image:
             return RouteResult(
                 route=RouteType.VISION,
@@ -160,7 +258,7 @@ class LocalRouter:
                 chitchat_response=None,
             )
 
-        if not self._ready or self._route_layer is None:
+        if not self._ready or self._utterance_matrix is None:
             return RouteResult(
                 route=RouteType.LLM_REQUIRED,
                 confidence=0.0,
@@ -173,49 +271,145 @@ class LocalRouter:
             fallback = RouteType.IGNORE if not cleaned else RouteType.LLM_REQUIRED
             return RouteResult(route=fallback, confidence=1.0, chitchat_response=None)
 
-        try:
-            result = self._route_layer(cleaned)
-        except Exception as error:
-            logger.error("gatekeeper_classify_failed", error=str(error))
-            return RouteResult(
-                route=RouteType.LLM_REQUIRED,
-                confidence=0.0,
-                chitchat_response=None,
-            )
-
-        if result.name is None:
-            return RouteResult(
-                route=RouteType.LLM_REQUIRED,
-                confidence=0.0,
-                chitchat_response=None,
-            )
-
-        route_type = RouteType(result.name)
-
+        exact_route = EXACT_UTTERANCE_ROUTES.get(cleaned)
+        if exact_route is None and _is_noise(cleaned):
+            exact_route = RouteType.IGNORE
+        if exact_route is not None:
+            route_type, confidence = exact_route, 1.0
+        elif len(cleaned) >= self._config.long_message_chars:
+            # Long messages are questions/discussion in practice; skip the model.
+            route_type, confidence = RouteType.LLM_REQUIRED, LONG_MESSAGE_CONFIDENCE
+        elif cleaned in self._classify_cache:
+            self._classify_cache.move_to_end(cleaned)
+            route_type, confidence = self._classify_cache[cleaned]
+        else:
+            if vector is None:
+                vector = self.get_vector(cleaned)
+
+            try:
+                # Vectors are unit-length already: one GEMV against every
+                # utterance gives cosine similarities; nearest neighbour wins.
+                sims = self._utterance_matrix @ np.asarray(vector, dtype=np.float32)
+                best = int(sims.argmax())
+                score = float(sims[best])
+            except Exception as error:
+                logger.error("gatekeeper_classify_failed", error=str(error))
+                return RouteResult(
+                    route=RouteType.LLM_REQUIRED,
+                    confidence=0.0,
+                    chitchat_response=None,
+                )
+
+            if score < self._config.similarity_threshold:
+                route_type, confidence = RouteType.LLM_REQUIRED, 0.0
+            else:
+                route_type, confidence = self._utterance_routes[best], score
+
+            self._classify_cache[cleaned] = (route_type, confidence)
+            if len(self._classify_cache) > self._config.classify_cache_size:
+                self._classify_cache.popitem(last=False)
+
+        # The reply is re-rolled on every hit; only the route is cached.
         chitchat_response = None
         if route_type == RouteType.CHITCHAT:
             chitchat_response = _pick_chitchat_response(cleaned)
 
         return RouteResult(
             route=route_type,
-            confidence=result.similarity_score or 0.0,
+            confidence=confidence,
             chitchat_response=chitchat_response,
         )
 
+    async def classify_batched(
+        self,
+        content: str,
+        embedder: EmbeddingBatcher,
+        has_image: bool = False,
+    ) -> RouteResult:
+        # Messages that need the model get their vector from the shared
+        # micro-batcher, so concurrent messages share one encoder call.
+        cleaned = content.strip().lower()
+        vector = None
+        if not has_image and self._needs_model(cleaned):
+            vector = await embedder.embed(cleaned)
+        return self.classify(content, has_image=has_image, vector=vector)
+
+    def _needs_model(self, cleaned: str) -> bool:
+        return (
+            self._ready
+            and 0 < len(cleaned) < self._config.long_message_chars
+            and cleaned not in EXACT_UTTERANCE_ROUTES
+            and not _is_noise(cleaned)
+            and cleaned not in self._classify_cache
+        )
+
+    def cached_embedding(self, text: str) -> list[float] | None:
+        # LRU only, never encodes: cheap enough to call on the event loop.
+        vector = self._cache_lookup(text)
+        return None if vector is None else vector.tolist()
+
     def get_embedding(self, text: str) -> list[float] | None:
+        vector = self.get_vector(text)
+        return None if vector is None else vector.tolist()
+
+    def get_vector(self, text: str) -> np.ndarray | None:
         if not self._ready or self._encoder is None:
             return None
+        cached = self._cache_lookup(text)
+        if cached is not None:
+            return cached
         try:
             embeddings = self._encoder(docs=[text])
             if embeddings and len(embeddings) > 0:
-                embedding = embeddings[0]
-                if hasattr(embedding, "tolist"):
-                    return embedding.tolist()
-                return embedding
+                vector = _unit(np.asarray(embeddings[0], dtype=np.float32))
+                self._cache_store(text, vector)
+                return vector
         except Exception as error:
             logger.error("embedding_failed", error=str(error))
         return None
 
+    def get_embeddings_batch(self, texts: list[str]) -> list[list[float] | None]:
+        if not texts:
+            return []
+        if not self._ready or self._encoder is None:
+            return [None] * len(texts)
+
+        vectors: list[np.ndarray | None] = [self._cache_lookup(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            try:
+                embeddings = self._encoder(docs=[texts[i] for i in missing])
+                for i, embedding in zip(missing, embeddings):
+                    vector = _unit(np.asarray(embedding, dtype=np.float32))
+                    self._cache_store(texts[i], vector)
+                    vectors[i] = vector
+            except Exception as error:
+                logger.error("embedding_batch_failed", error=str(error), size=len(missing))
+
+        return [None if vector is None else vector.tolist() for vector in vectors]
+
+    # ═══════════════════════════════════════════
+    # EMBEDDING CACHE (in-process LRU)
+    # ═══════════════════════════════════════════
+
+    # Embeddings are computed on worker threads, so cache access is locked.
+    # Entries are float32 arrays: ~1.5 KB each instead of a list of Python floats.
+
+    def _cache_lookup(self, text: str) -> np.ndarray | None:
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(text)
+            if cached is not None:
+                self._embedding_cache.move_to_end(text)
+            return cached
+
+    def _cache_store(self, text: str, embedding: np.ndarray) -> None:
+        with self._embedding_cache_lock:
+            self._embedding_cache[text] = embedding
+            self._embedding_cache.move_to_end(text)
+            while len(self._embedding_cache) > self._config.embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+
 
 # ═══════════════════════════════════════════════
 # ROUTE RESULT
@@ -250,26 +444,44 @@ class RouteResult:
 # CHITCHAT RESPONSE PICKER
 # ═══════════════════════════════════════════════
 
+# Single-word keywords -> (rank, bucket); lower rank wins, mirroring the order
+# the buckets used to be tested in. Multi-word keywords never match a split
+# word, so only the phrase buckets below look at them.
+_WORD_DISPATCH: dict[str, tuple[int, str]] = {}
+for _rank, _bucket, _keywords in (
+    (0, "greeting_morning", MORNING_KEYWORDS),
+    (1, "greeting_night", NIGHT_KEYWORDS),
+    (2, "thanks", THANKS_KEYWORDS),
+    (3, "bye", BYE_KEYWORDS),
+    (4, "whats_up", WHATS_UP_KEYWORDS),
+    (6, "greeting", GREETING_KEYWORDS),
+):
+    for _keyword in _keywords:
+        _WORD_DISPATCH.setdefault(_keyword, (_rank, _bucket))
+
+_PHRASE_DISPATCH: tuple[tuple[int, str, frozenset[str]], ...] = (
+    (4, "whats_up", frozenset(WHATS_UP_KEYWORDS)),
+    (5, "how_are_you", frozenset(HOW_ARE_YOU_KEYWORDS)),
+)
+
+_DEFAULT_DISPATCH = (7, "greeting")
+
+
 def _pick_chitchat_response(content: str) -> str:
-    words = set(content.split())
-
-    if words & MORNING_KEYWORDS:
-        return random.choice(CHITCHAT_RESPONSES["greeting_morning"])
-    if words & NIGHT_KEYWORDS:
-        return random.choice(CHITCHAT_RESPONSES["greeting_night"])
-    if words & THANKS_KEYWORDS:
-        return random.choice(CHITCHAT_RESPONSES["thanks"])
-    if words & BYE_KEYWORDS:
-        return random.choice(CHITCHAT_RESPONSES["bye"])
-    if words & WHATS_UP_KEYWORDS or _phrase_match(content, WHATS_UP_KEYWORDS):
-        return random.choice(CHITCHAT_RESPONSES["whats_up"])
-    if _phrase_match(content, HOW_ARE_YOU_KEYWORDS):
-        return random.choice(CHITCHAT_RESPONSES["how_are_you"])
-    if words & GREETING_KEYWORDS:
-        return random.choice(CHITCHAT_RESPONSES["greeting"])
-
-    return random.choice(CHITCHAT_RESPONSES["greeting"])
-
-
-def _phrase_match(content: str, phrases: set[str]) -> bool:
+    hit = min(
+        (_WORD_DISPATCH[word] for word in content.split() if word in _WORD_DISPATCH),
+        default=_DEFAULT_DISPATCH,
+    )
+
+    for rank, bucket, phrases in _PHRASE_DISPATCH:
+        if rank >= hit[0]:
+            break
+        if _phrase_match(content, phrases):
+            hit = (rank, bucket)
+            break
+
+    return random.choice(CHITCHAT_RESPONSES[hit[1]])
+
+
+def _phrase_match(content: str, phrases: frozenset[str]) -> bool:
     return any(phrase in content for phrase in phrases)
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 import asyncpg
 import structlog
 
@@ -10,6 +12,9 @@ logger = structlog.get_logger("twomoon.database")
 # SCHEMA
 # ═══════════════════════════════════════════════
 
+# Output size of the router's embedding model (BAAI/bge-small-en-v1.5).
+EMBEDDING_DIM = 384
+
 SCHEMA_SQL = [
     """
     CREATE TABLE IF NOT EXISTS user_profiles (
@@ -37,14 +42,14 @@ SCHEMA_SQL = [
 
     "CREATE INDEX IF NOT EXISTS idx_memories_user ON bot_memories (user_id, importance DESC)",
 
-    """
+    f"""
     CREATE TABLE IF NOT EXISTS conversation_log (
         id         SERIAL PRIMARY KEY,
         channel_id TEXT NOT NULL,
         message_id TEXT UNIQUE NOT NULL,
         user_id    TEXT NOT NULL,
         content    TEXT NOT NULL,
-        embedding  FLOAT4[] DEFAULT NULL,
+        embedding  VECTOR({EMBEDDING_DIM}) DEFAULT NULL,
         sentiment  FLOAT DEFAULT 0.0,
         is_bot     BOOLEAN DEFAULT FALSE,
         created_at TIMESTAMPTZ DEFAULT now()
@@ -52,7 +57,6 @@ SCHEMA_SQL = [
     """,
 
     "CREATE INDEX IF NOT EXISTS idx_convlog_channel ON conversation_log (channel_id, created_at DESC)",
-    "CREATE INDEX IF NOT EXISTS idx_convlog_embedding ON conversation_log USING hnsw (embedding opclass_vec_l2_ops)",
 
     """
     CREATE TABLE IF NOT EXISTS server_personas (
@@ -81,30 +85,111 @@ SCHEMA_SQL = [
     """,
 ]
 
+# One-time migrations. Each group runs only when the catalog shows it is
+# still needed, so a migrated cluster (or a bot user without admin rights)
+# skips them on every later boot. They run one statement at a time: column
+# type changes and cluster settings cannot share a transaction.
+EMBEDDING_COLUMN_TYPE_SQL = """SELECT crdb_sql_type FROM information_schema.columns
+   WHERE table_schema = current_schema()
+     AND table_name = 'conversation_log'
+     AND column_name = 'embedding'"""
+
+CONVLOG_INDEXES_SQL = """SELECT indexname FROM pg_indexes
+   WHERE schemaname = current_schema() AND tablename = 'conversation_log'"""
+
+# Existing deployments stored embeddings as FLOAT4[]; convert in place.
+EMBEDDING_VECTOR_MIGRATION = [
+    "SET enable_experimental_alter_column_type_general = true",
+    f"ALTER TABLE conversation_log ALTER COLUMN embedding TYPE VECTOR({EMBEDDING_DIM}) USING embedding::VECTOR({EMBEDDING_DIM})",
+]
+
+LEGACY_EMBEDDING_INDEX = "idx_convlog_embedding"
+
+# Embeddings are unit-length, so searches rank by inner product.
+EMBEDDING_INDEX = "idx_convlog_embedding_ip"
+EMBEDDING_INDEX_MIGRATION = [
+    "SET CLUSTER SETTING feature.vector_index.enabled = true",
+    f"CREATE VECTOR INDEX IF NOT EXISTS {EMBEDDING_INDEX} ON conversation_log (channel_id, embedding vector_ip_ops)",
+]
+
 CLEANUP_SQL = {
     "conversation_log": "DELETE FROM conversation_log WHERE created_at < now() - INTERVAL '{days} days'",
     "bot_memories": "DELETE FROM bot_memories WHERE created_at < now() - INTERVAL '30 days' AND importance < 7",
 }
 
 
+HEALTH_PROBE_SQL = "SELECT 1"
+
+
+# ═══════════════════════════════════════════════
+# CONNECTION INIT
+# ═══════════════════════════════════════════════
+
+async def init_connection(conn: asyncpg.Connection) -> None:
+    # Runs once per new pool connection; executing the probe here seeds
+    # asyncpg's per-connection statement cache so health checks skip parse/plan.
+    await conn.fetchval(HEALTH_PROBE_SQL)
+
+
+async def ping(pool: asyncpg.Pool) -> bool:
+    async with pool.acquire() as conn:
+        await conn.fetchval(HEALTH_PROBE_SQL)
+    return True
+
+
 # ═══════════════════════════════════════════════
 # BOOTSTRAP
 # ═══════════════════════════════════════════════
 
+# DDL and bulk deletes are exempt from the pool's fail-fast command_timeout.
+MAINTENANCE_TIMEOUT = 300.0
+
+
 async def bootstrap_schema(pool: asyncpg.Pool) -> None:
     async with pool.acquire() as conn:
-        for statement in SCHEMA_SQL:
-            try:
-                await conn.execute(statement)
-            except Exception as error:
-                logger.error("schema_exec_failed", statement=statement[:80], error=str(error))
+        # The idempotent CREATEs go out as one batch; only if that fails are
+        # they replayed singly to find and skip the offending statement.
+        try:
+            async with conn.transaction():
+                await conn.execute(";\n".join(SCHEMA_SQL), timeout=MAINTENANCE_TIMEOUT)
+        except Exception as error:
+            logger.error("schema_batch_failed", error=str(error))
+            await _execute_each(conn, SCHEMA_SQL)
+
+        await _execute_each(conn, await _pending_migrations(conn))
+
+
+async def _pending_migrations(conn: asyncpg.Connection) -> list[str]:
+    try:
+        column_type = await conn.fetchval(EMBEDDING_COLUMN_TYPE_SQL)
+        indexes = {row["indexname"] for row in await conn.fetch(CONVLOG_INDEXES_SQL)}
+    except Exception as error:
+        logger.error("migration_probe_failed", error=str(error))
+        return []
+
+    statements = []
+    if column_type and not column_type.upper().startswith("VECTOR"):
+        statements += EMBEDDING_VECTOR_MIGRATION
+    if LEGACY_EMBEDDING_INDEX in indexes:
+        statements.append(f"DROP INDEX IF EXISTS conversation_log@{LEGACY_EMBEDDING_INDEX}")
+    if EMBEDDING_INDEX not in indexes:
+        statements += EMBEDDING_INDEX_MIGRATION
+    return statements
+
+
+async def _execute_each(conn: asyncpg.Connection, statements: list[str]) -> None:
+    for statement in statements:
+        try:
+            await conn.execute(statement, timeout=MAINTENANCE_TIMEOUT)
+        except Exception as error:
+            logger.error("schema_exec_failed", statement=statement[:80], error=str(error))
 
 
 async def cleanup_old_data(pool: asyncpg.Pool, days: int = 7) -> None:
     async with pool.acquire() as conn:
         for table, sql in CLEANUP_SQL.items():
             try:
-                result = await conn.execute(sql.format(days=days))
+                result = await conn.execute(sql.format(days=days), timeout=MAINTENANCE_TIMEOUT)
                 logger.info("cleanup_done", table=table, result=result)
             except Exception as error:
                 logger.error("cleanup_failed", table=table, error=str(error))
@@ -118,15 +203,31 @@ async def execute(pool: asyncpg.Pool, query: str, *args) -> str:
     try:
         async with pool.acquire() as conn:
             return await conn.execute(query, *args)
+    except asyncio.TimeoutError:
+        logger.error("query_execute_timeout", query=query[:80])
+        return ""
     except Exception as error:
         logger.error("query_execute_failed", error=str(error))
         return ""
 
 
+async def executemany(pool: asyncpg.Pool, query: str, args: list[tuple]) -> None:
+    try:
+        async with pool.acquire() as conn:
+            await conn.executemany(query, args)
+    except asyncio.TimeoutError:
+        logger.error("query_executemany_timeout", query=query[:80])
+    except Exception as error:
+        logger.error("query_executemany_failed", error=str(error))
+
+
 async def fetch(pool: asyncpg.Pool, query: str, *args) -> list[asyncpg.Record]:
     try:
         async with pool.acquire() as conn:
             return await conn.fetch(query, *args)
+    except asyncio.TimeoutError:
+        logger.error("query_fetch_timeout", query=query[:80])
+        return []
     except Exception as error:
         logger.error("query_fetch_failed", error=str(error))
         return []
@@ -136,6 +237,9 @@ async def fetchrow(pool: asyncpg.Pool, query: str, *args) -> asyncpg.Record | No
     try:
         async with pool.acquire() as conn:
             return await conn.fetchrow(query, *args)
+    except asyncio.TimeoutError:
+        logger.error("query_fetchrow_timeout", query=query[:80])
+        return None
     except Exception as error:
         logger.error("query_fetchrow_failed", error=str(error))
         return None
@@ -145,6 +249,9 @@ async def fetchval(pool: asyncpg.Pool, query: str, *args):
     try:
         async with pool.acquire() as conn:
             return await conn.fetchval(query, *args)
+    except asyncio.TimeoutError:
+        logger.error("query_fetchval_timeout", query=query[:80])
+        return None
     except Exception as error:
         logger.error("query_fetchval_failed", error=str(error))
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+
+import asyncpg
+import structlog
+
+from database import user_store
+
+logger = structlog.get_logger("twomoon.interaction_batcher")
+
+
+# ═══════════════════════════════════════════════
+# INTERACTION BATCHER (coalesced profile bumps)
+# ═══════════════════════════════════════════════
+
+class InteractionBatcher:
+    def __init__(self, pool: asyncpg.Pool, flush_interval_seconds: float = 0.1) -> None:
+        self._pool = pool
+        self._interval = flush_interval_seconds
+        # user_id -> [display_name, preferred_lang, interactions since last flush]
+        self._pending: dict[str, list] = {}
+        self._flusher: asyncio.Task | None = None
+
+    def record(
+        self,
+        user_id: str | int,
+        display_name: str,
+        preferred_lang: str | None = None,
+    ) -> None:
+        uid_str = str(user_id)
+        pending = self._pending.get(uid_str)
+        if pending is None:
+            self._pending[uid_str] = [display_name, preferred_lang, 1]
+        else:
+            pending[0] = display_name
+            if preferred_lang is not None:
+                pending[1] = preferred_lang
+            pending[2] += 1
+
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        rows = [(uid, name, lang, count) for uid, (name, lang, count) in batch.items()]
+        await user_store.record_interactions(self._pool, rows)
+        logger.debug("interaction_batch_flushed", size=len(rows))
+
+    async def close(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    # ═══════════════════════════════════════════
+    # WORKER
+    # ═══════════════════════════════════════════
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self._interval)
+        # Cleared before the write so records arriving meanwhile schedule the next flush.
+        self._flusher = None
+        await self.flush()
@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import asyncio
 import re
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 import asyncpg
 import structlog
 
-from database.connection import execute, fetch, fetchrow
+from database.connection import execute, executemany, fetch, fetchrow
 
 logger = structlog.get_logger("twomoon.memory_store")
 
@@ -44,19 +46,52 @@ TOPIC_KEYWORDS: dict[str, list[str]] = {
     ],
 }
 
+TOPIC_OFFLOAD_CHARS = 500
+
 _IMPORTANCE_WORDS = re.compile(
     r"\b(always|never|hate|love|important|serious|favorite|worst|best)\b",
     re.IGNORECASE,
 )
 
 
+# keyword -> topics it (or any keyword that is its prefix) belongs to. The
+# lookahead alternation reports the longest keyword at each position, so
+# shorter prefix keywords hidden behind it are folded in here.
+_KEYWORD_TOPICS: dict[str, frozenset[str]] = {
+    keyword: frozenset(
+        topic
+        for topic, keywords in TOPIC_KEYWORDS.items()
+        for other in keywords
+        if keyword.startswith(other)
+    )
+    for keywords in TOPIC_KEYWORDS.values()
+    for keyword in keywords
+}
+
+_TOPIC_RE = re.compile(
+    "(?=("
+    + "|".join(re.escape(k) for k in sorted(_KEYWORD_TOPICS, key=len, reverse=True))
+    + "))"
+)
+
+
 def detect_topics(content: str) -> list[str]:
-    lower = content.lower()
-    found = []
-    for topic, keywords in TOPIC_KEYWORDS.items():
-        if any(keyword in lower for keyword in keywords):
-            found.append(topic)
-    return found
+    return list(_detect_topics(content))
+
+
+@lru_cache(maxsize=8192)
+def _detect_topics(content: str) -> tuple[str, ...]:
+    hits: set[str] = set()
+    for keyword in set(_TOPIC_RE.findall(content.lower())):
+        hits.update(_KEYWORD_TOPICS[keyword])
+    return tuple(topic for topic in TOPIC_KEYWORDS if topic in hits)
+
+
+async def _detect_topics_async(content: str) -> list[str]:
+    # Long messages are scanned off the event loop; short ones aren't worth the hop.
+    if len(content) > TOPIC_OFFLOAD_CHARS:
+        return await asyncio.to_thread(detect_topics, content)
+    return detect_topics(content)
 
 
 def calculate_importance(content: str, sentiment: float) -> int:
@@ -82,20 +117,20 @@ async def save_memory(
 ) -> None:
     uid_str = str(user_id)
 
-    topics = detect_topics(content)
+    topics = await _detect_topics_async(content)
     if not topics or len(content) < 20:
         return
 
     importance = calculate_importance(content, sentiment)
     truncated = content[:500]
 
-    for topic in topics:
-        await execute(
-            pool,
-            """INSERT INTO bot_memories (user_id, topic, content, importance)
-               VALUES ($1, $2, $3, $4)""",
-            uid_str, topic, truncated, importance,
-        )
+    # The server expands the topic array into rows: one statement, atomic.
+    await execute(
+        pool,
+        """INSERT INTO bot_memories (user_id, topic, content, importance)
+           SELECT $1, topic, $3, $4 FROM unnest($2::TEXT[]) AS topic""",
+        uid_str, topics, truncated, importance,
+    )
 
 
 async def recall_memory(
@@ -105,7 +140,7 @@ async def recall_memory(
     limit: int = 3,
 ) -> list[str]:
     uid_str = str(user_id)
-    topics = detect_topics(current_content)
+    topics = await _detect_topics_async(current_content)
 
     if topics:
         rows = await fetch(
@@ -152,102 +187,105 @@ async def get_user_top_topics(
 # CONVERSATION LOG
 # ═══════════════════════════════════════════════
 
-async def save_conversation(
+_INSERT_CONVERSATION_SQL = """INSERT INTO conversation_log
+       (channel_id, message_id, user_id, content, embedding, sentiment, is_bot)
+   VALUES ($1, $2, $3, $4, $5::FLOAT4[]::VECTOR, $6, $7)
+   ON CONFLICT (message_id) DO NOTHING"""
+
+
+async def save_conversations_bulk(
     pool: asyncpg.Pool,
-    channel_id: str | int,
-    message_id: str | int,
-    user_id: str | int,
-    content: str,
-    embedding: list[float] | None = None,
-    sentiment: float = 0.0,
-    is_bot: bool = False,
+    entries: list[dict],
 ) -> None:
-    cid = str(channel_id)
-    mid = str(message_id)
-    uid = str(user_id)
+    if not entries:
+        return
 
-    await execute(
-        pool,
-        """INSERT INTO conversation_log
-               (channel_id, message_id, user_id, content, embedding, sentiment, is_bot)
-           VALUES ($1, $2, $3, $4, $5, $6, $7)
-           ON CONFLICT (message_id) DO NOTHING""",
-        cid, mid, uid, content[:2000],
-        embedding,
-        sentiment, is_bot,
-    )
+    rows = [
+        (
+            str(entry["channel_id"]),
+            str(entry["message_id"]),
+            str(entry["user_id"]),
+            entry["content"][:2000],
+            entry.get("embedding"),
+            entry.get("sentiment", 0.0),
+            entry.get("is_bot", False),
+        )
+        for entry in entries
+    ]
+    await executemany(pool, _INSERT_CONVERSATION_SQL, rows)
+
+
+_RECALL_AND_SEARCH_SQL = """
+WITH mem AS (
+    SELECT content, importance, created_at
+    FROM bot_memories
+    WHERE user_id = $1
+      AND ($2::TEXT[] IS NULL OR topic = ANY($2))
+    ORDER BY importance DESC, created_at DESC
+    LIMIT $3
+),
+sem AS (
+    SELECT message_id, user_id, content, is_bot, created_at,
+           embedding <#> $5::FLOAT4[]::VECTOR AS distance
+    FROM conversation_log
+    WHERE channel_id = $4
+      AND embedding IS NOT NULL
+      AND created_at > $6
+    ORDER BY distance ASC
+    LIMIT $7
+)
+SELECT 'mem' AS kind, NULL::TEXT AS message_id, NULL::TEXT AS user_id, content,
+       NULL::BOOLEAN AS is_bot, created_at, NULL::FLOAT8 AS distance, importance
+FROM mem
+UNION ALL
+SELECT 'sem' AS kind, message_id, user_id, content,
+       is_bot, created_at, distance, NULL::INT AS importance
+FROM sem
+"""
 
 
-async def semantic_search(
+async def recall_and_search(
     pool: asyncpg.Pool,
+    user_id: str | int,
+    current_content: str,
     channel_id: str | int,
     query_embedding: list[float],
     window_hours: int = 24,
-    limit: int = 3,
-) -> list[dict]:
-    cid = str(channel_id)
+    memory_limit: int = 3,
+    search_limit: int = 3,
+) -> tuple[list[str], list[dict]]:
+    # recall_memory plus a semantic search of the channel log in a single round-trip.
+    topics = await _detect_topics_async(current_content) or None
     cutoff_time = datetime.now(timezone.utc) - timedelta(hours=window_hours)
-    
-    embedding_str = str(query_embedding)
 
     rows = await fetch(
         pool,
-        """
-        WITH candidates AS (
-            SELECT id, user_id, content, is_bot, created_at, embedding
-            FROM conversation_log
-            WHERE channel_id = $1
-              AND embedding IS NOT NULL
-              AND created_at > $3
-        )
-        SELECT
-            user_id,
-            content,
-            is_bot,
-            created_at,
-            (embedding::vector <-> $2::vector) as distance
-        FROM candidates
-        ORDER BY distance ASC
-        LIMIT $4
-        """,
-        cid, embedding_str, cutoff_time, limit,
+        _RECALL_AND_SEARCH_SQL,
+        str(user_id), topics, memory_limit,
+        str(channel_id), query_embedding, cutoff_time, search_limit,
     )
-    
-    return [
-        {
-            "user_id": row["user_id"],
-            "content": row["content"],
-            "is_bot": row["is_bot"],
-            "created_at": row["created_at"],
-            "similarity": 1.0 - (float(row["distance"]) if row["distance"] is not None else 1.0),
-        }
-        for row in rows
-    ]
-
 
-async def get_recent_messages(
-    pool: asyncpg.Pool,
-    channel_id: str | int,
-    limit: int = 15,
-) -> list[dict]:
-    cid = str(channel_id)
-    
-    rows = await fetch(
-        pool,
-        """SELECT user_id, content, is_bot, created_at
-           FROM conversation_log
-           WHERE channel_id = $1
-           ORDER BY created_at DESC
-           LIMIT $2""",
-        cid, limit,
+    # UNION ALL does not promise to keep each branch's ordering.
+    mem_rows = sorted(
+        (row for row in rows if row["kind"] == "mem"),
+        key=lambda row: (row["importance"], row["created_at"]),
+        reverse=True,
+    )
+    sem_rows = sorted(
+        (row for row in rows if row["kind"] == "sem"),
+        key=lambda row: float(row["distance"]) if row["distance"] is not None else 0.0,
     )
 
-    return [
+    memories = [row["content"] for row in mem_rows]
+    results = [
         {
+            "message_id": row["message_id"],
             "user_id": row["user_id"],
             "content": row["content"],
             "is_bot": row["is_bot"],
             "created_at": row["created_at"],
+            "similarity": -float(row["distance"]) if row["distance"] is not None else 0.0,
         }
-        for row in reversed(rows)
+        for row in sem_rows
     ]
+    return memories, results
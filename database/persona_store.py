@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 import asyncpg
 import structlog
 
@@ -9,9 +11,11 @@ from services import redis_client as rc
 logger = structlog.get_logger("twomoon.persona_store")
 
 CACHE_TTL = 600
+EFFECTIVE_CACHE_TTL = 3600
 
-VALID_PRESETS = {"twomoon", "homie", "mentor", "chaos", "professional", "matchuser"}
-VALID_QUIRKS = {"light", "medium", "heavy"}
+DEFAULT_PRESET = "twomoon"
+VALID_PRESETS = frozenset({"twomoon", "homie", "mentor", "chaos", "professional", "matchuser"})
+VALID_QUIRKS = frozenset({"light", "medium", "heavy"})
 
 
 # ═══════════════════════════════════════════════
@@ -27,18 +31,21 @@ async def get_server_persona(
     if cached:
         return cached
 
+    data = await _load_server_persona(pool, server_id)
+    await rc.cache_set(redis, f"sp:{server_id}", data, CACHE_TTL)
+    return data
+
+
+async def _load_server_persona(pool: asyncpg.Pool, server_id: str) -> dict:
     row = await fetchrow(
         pool,
         "SELECT preset, quirk_intensity FROM server_personas WHERE server_id = $1",
         server_id,
     )
-
-    data = {
-        "preset": row["preset"] if row else "twomoon",
+    return {
+        "preset": row["preset"] if row else DEFAULT_PRESET,
         "quirk_intensity": row["quirk_intensity"] if row else "heavy",
     }
-    await rc.cache_set(redis, f"sp:{server_id}", data, CACHE_TTL)
-    return data
 
 
 async def set_server_persona(
@@ -58,7 +65,7 @@ async def set_server_persona(
              updated_at = now()""",
         server_id, preset, quirk_intensity,
     )
-    await rc.cache_set(redis, f"sp:{server_id}", None, 1)
+    await rc.cache_delete_pattern(redis, f"pe:{server_id}:*", f"sp:{server_id}")
 
 
 # ═══════════════════════════════════════════════
@@ -74,22 +81,25 @@ async def get_user_persona(
     if cached:
         return cached
 
+    data = await _load_user_persona(pool, user_id)
+    if data is not None:
+        await rc.cache_set(redis, f"up:{user_id}", data, CACHE_TTL)
+    return data
+
+
+async def _load_user_persona(pool: asyncpg.Pool, user_id: str) -> dict | None:
     row = await fetchrow(
         pool,
         "SELECT preset, quirk_intensity, style_sample FROM user_personas WHERE user_id = $1",
         user_id,
     )
-
     if not row:
         return None
-
-    data = {
+    return {
         "preset": row["preset"],
         "quirk_intensity": row["quirk_intensity"],
         "style_sample": row["style_sample"],
     }
-    await rc.cache_set(redis, f"up:{user_id}", data, CACHE_TTL)
-    return data
 
 
 async def set_user_persona(
@@ -111,7 +121,7 @@ async def set_user_persona(
              updated_at = now()""",
         user_id, preset, quirk_intensity, style_sample,
     )
-    await rc.cache_set(redis, f"up:{user_id}", None, 1)
+    await rc.cache_delete_pattern(redis, f"pe:*:{user_id}", f"up:{user_id}")
 
 
 async def reset_user_persona(
@@ -120,7 +130,7 @@ async def reset_user_persona(
     user_id: str,
 ) -> None:
     await execute(pool, "DELETE FROM user_personas WHERE user_id = $1", user_id)
-    await rc.cache_set(redis, f"up:{user_id}", None, 1)
+    await rc.cache_delete_pattern(redis, f"pe:*:{user_id}", f"up:{user_id}")
 
 
 # ═══════════════════════════════════════════════
@@ -133,20 +143,52 @@ async def get_effective_persona(
     user_id: str,
     server_id: str,
 ) -> dict:
-    user_p = await get_user_persona(pool, redis, user_id)
-    server_p = await get_server_persona(pool, redis, server_id)
+    cache_key = f"pe:{server_id}:{user_id}"
+    cached = await rc.cache_get(redis, cache_key)
+    if cached:
+        return cached
+
+    # Both layers in one MGET; whatever missed is loaded concurrently and
+    # written back in one pipeline.
+    user_key, server_key = f"up:{user_id}", f"sp:{server_id}"
+    user_p, server_p = await rc.cache_mget(redis, [user_key, server_key])
+
+    missing_user, missing_server = not user_p, not server_p
+    if missing_user and missing_server:
+        user_p, server_p = await asyncio.gather(
+            _load_user_persona(pool, user_id),
+            _load_server_persona(pool, server_id),
+        )
+    elif missing_user:
+        user_p = await _load_user_persona(pool, user_id)
+    elif missing_server:
+        server_p = await _load_server_persona(pool, server_id)
+
+    writes = {}
+    if missing_user and user_p is not None:
+        writes[user_key] = user_p
+    if missing_server:
+        writes[server_key] = server_p
+    await rc.cache_mset(redis, writes, CACHE_TTL)
 
     if user_p and user_p.get("preset"):
-        return {
+        data = {
             "source": "user",
             "preset": user_p["preset"],
             "quirk_intensity": user_p.get("quirk_intensity") or server_p.get("quirk_intensity", "heavy"),
             "style_sample": user_p.get("style_sample"),
         }
+    else:
+        data = {
+            "source": "server",
+            "preset": server_p.get("preset", DEFAULT_PRESET),
+            "quirk_intensity": server_p.get("quirk_intensity", "heavy"),
+            "style_sample": None,
+        }
 
-    return {
-        "source": "server",
-        "preset": server_p.get("preset", "twomoon"),
-        "quirk_intensity": server_p.get("quirk_intensity", "heavy"),
-        "style_sample": None,
-    }
\ No newline at end of file
+    # Normalised here so prompt building can index preset tables directly.
+    if data["preset"] not in VALID_PRESETS:
+        data["preset"] = DEFAULT_PRESET
+
+    await rc.cache_set(redis, cache_key, data, EFFECTIVE_CACHE_TTL)
+    return data
@@ -5,7 +5,7 @@ from typing import Any
 import asyncpg
 import structlog
 
-from database.connection import execute, fetch, fetchrow
+from database.connection import execute, executemany, fetch, fetchrow
 
 logger = structlog.get_logger("twomoon.user_store")
 
@@ -25,36 +25,24 @@ async def get_user(pool: asyncpg.Pool, user_id: str | int) -> dict | None:
     return dict(row) if row else None
 
 
-async def upsert_user(
+async def record_interactions(
     pool: asyncpg.Pool,
-    user_id: str | int,
-    display_name: str,
-    preferred_lang: str | None = None,
-) -> dict | None:
-    uid_str = str(user_id)
-    
-    existing = await get_user(pool, uid_str)
-
-    if existing:
-        await execute(
-            pool,
-            """UPDATE user_profiles SET
-                display_name = $2,
-                preferred_lang = COALESCE($3, preferred_lang),
-                interaction_count = interaction_count + 1,
-                last_interaction = now()
-               WHERE user_id = $1""",
-            uid_str, display_name, preferred_lang,
-        )
-    else:
-        await execute(
-            pool,
-            """INSERT INTO user_profiles (user_id, display_name, preferred_lang)
-               VALUES ($1, $2, COALESCE($3, 'en'))""",
-            uid_str, display_name, preferred_lang,
-        )
-
-    return await get_user(pool, uid_str)
+    rows: list[tuple[str, str, str | None, int]],
+) -> None:
+    # (user_id, display_name, preferred_lang, count): `count` interactions
+    # folded into one upsert. A new profile starts at count - 1, as the first
+    # interaction creates it without bumping the counter.
+    await executemany(
+        pool,
+        """INSERT INTO user_profiles (user_id, display_name, preferred_lang, interaction_count)
+           VALUES ($1, $2, COALESCE($3, 'en'), $4::INT - 1)
+           ON CONFLICT (user_id) DO UPDATE SET
+             display_name = $2,
+             preferred_lang = COALESCE($3, user_profiles.preferred_lang),
+             interaction_count = user_profiles.interaction_count + $4::INT,
+             last_interaction = now()""",
+        rows,
+    )
 
 
 # ═══════════════════════════════════════════════
@@ -128,21 +116,21 @@ async def get_language(pool: asyncpg.Pool, user_id: str | int) -> str:
 # STATS (for /stats command)
 # ═══════════════════════════════════════════════
 
-async def get_top_users(
+async def get_stats_bundle(
     pool: asyncpg.Pool,
     limit: int = 10,
-) -> list[dict]:
+) -> dict[str, Any]:
     rows = await fetch(
         pool,
-        """SELECT user_id, display_name, interaction_count, sentiment_avg
+        """SELECT user_id, display_name, interaction_count, sentiment_avg,
+                  COUNT(*) OVER () AS total
            FROM user_profiles
            ORDER BY interaction_count DESC
            LIMIT $1""",
         limit,
     )
-    return [dict(row) for row in rows]
-
-
-async def get_total_users(pool: asyncpg.Pool) -> int:
-    row = await fetchrow(pool, "SELECT COUNT(*) as total FROM user_profiles")
-    return row["total"] if row else 0
+    return {
+        "total": rows[0]["total"] if rows else 0,
+        # Records index by column name just like dicts; no per-row copy.
+        "top_users": rows,
+    }
@@ -11,8 +11,11 @@ if platform.system() != "Windows":
         pass
 
 import asyncio
+import atexit
 import logging
+import logging.handlers
 import pathlib
+import queue
 
 import discord
 from discord.ext import commands
@@ -27,16 +30,53 @@ from config import load_settings, Settings
 
 def setup_logging(debug: bool = False) -> None:
     log_level = logging.DEBUG if debug else logging.INFO
+
+    # Every record, discord.py's stdlib ones included, is rendered by the
+    # same structlog renderer. Rendering happens on the QueueHandler because
+    # QueueHandler.prepare() flattens the record's message to a string before
+    # enqueueing; the listener thread then only does the blocking stdout write.
+    if debug:
+        render = [structlog.dev.ConsoleRenderer()]
+    else:
+        render = [structlog.processors.format_exc_info, structlog.processors.JSONRenderer()]
+
+    formatter = structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.contextvars.merge_contextvars,
+            structlog.processors.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            *render,
+        ],
+    )
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(log_level)
+
     structlog.configure(
         processors=[
             structlog.contextvars.merge_contextvars,
             structlog.processors.add_log_level,
             structlog.processors.TimeStamper(fmt="iso"),
-            structlog.dev.ConsoleRenderer() if debug else structlog.processors.JSONRenderer(),
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         wrapper_class=structlog.make_filtering_bound_logger(log_level),
         context_class=dict,
-        logger_factory=structlog.PrintLoggerFactory(),
+        logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=True,
     )
 
@@ -48,6 +88,12 @@ logger = structlog.get_logger("twomoon.main")
 # CONNECTION POOLS
 # ═══════════════════════════════════════════════
 
+# Outside this range the pool either serializes bursts or oversubscribes the
+# database; create_pool already opens min_size connections up front.
+POOL_SIZE_SANE_MIN = 5
+POOL_SIZE_SANE_MAX = 100
+
+
 class ConnectionPools:
     def __init__(self) -> None:
         self.db = None
@@ -57,6 +103,16 @@ class ConnectionPools:
         import asyncpg
         import redis.asyncio as aioredis
 
+        from database.connection import init_connection
+
+        pool_max = settings.database.pool_max_size
+        if not POOL_SIZE_SANE_MIN <= pool_max <= POOL_SIZE_SANE_MAX:
+            logger.warning(
+                "database_pool_size_unusual",
+                pool_max_size=pool_max,
+                expected_range=(POOL_SIZE_SANE_MIN, POOL_SIZE_SANE_MAX),
+            )
+
         try:
             ssl_context = "require" if settings.database.ssl else None
             self.db = await asyncpg.create_pool(
@@ -64,7 +120,12 @@ class ConnectionPools:
                 min_size=settings.database.pool_min_size,
                 max_size=settings.database.pool_max_size,
                 command_timeout=settings.database.command_timeout,
+                max_inactive_connection_lifetime=settings.database.max_inactive_connection_lifetime,
+                statement_cache_size=settings.database.statement_cache_size,
+                max_cached_statement_lifetime=settings.database.max_cached_statement_lifetime,
+                max_cacheable_statement_size=settings.database.max_cacheable_statement_size,
                 ssl=ssl_context,
+                init=init_connection,
             )
             logger.info("database_pool_ready", pool_size=settings.database.pool_max_size)
         except Exception as error:
@@ -111,6 +172,9 @@ class TwoMoonBot(commands.Bot):
         self.settings = settings
         self.pools = pools
         self.local_router = None
+        self.gateway = None
+        self.interactions = None
+        self.embedder = None
 
     async def setup_hook(self) -> None:
         # ═══ Schema Bootstrap ═══
@@ -124,19 +188,41 @@ class TwoMoonBot(commands.Bot):
         await self.local_router.initialize()
         logger.info("local_router_ready")
 
+        from core.embedding_batcher import EmbeddingBatcher
+        self.embedder = EmbeddingBatcher(
+            self.local_router,
+            max_batch=self.settings.router.embedding_batch_size,
+            max_wait_seconds=self.settings.router.embedding_batch_wait_ms / 1000,
+        )
+
+        # ═══ LLM Gateway (shared by all cogs) ═══
+        from core.llm_gateway import LLMGateway
+        self.gateway = LLMGateway(settings=self.settings, redis=self.pools.redis)
+        logger.info("llm_gateway_ready")
+
+        from database.interaction_batcher import InteractionBatcher
+        self.interactions = InteractionBatcher(self.pools.db)
+
         # ═══ Load Cogs ═══
         cogs_dir = pathlib.Path(__file__).parent / "cogs"
+        extensions = [
+            f"cogs.{cog_file.stem}"
+            for cog_file in sorted(cogs_dir.glob("*.py"))
+            if not cog_file.name.startswith("_")
+        ]
+        results = await asyncio.gather(
+            *(self.load_extension(extension) for extension in extensions),
+            return_exceptions=True,
+        )
         loaded = 0
-        for cog_file in sorted(cogs_dir.glob("*.py")):
-            if cog_file.name.startswith("_"):
-                continue
-            extension = f"cogs.{cog_file.stem}"
-            try:
-                await self.load_extension(extension)
+        for extension, result in zip(extensions, results):
+            if isinstance(result, commands.ExtensionError):
+                logger.error("cog_load_failed", extension=extension, error=str(result))
+            elif isinstance(result, BaseException):
+                raise result
+            else:
                 logger.info("cog_loaded", extension=extension)
                 loaded += 1
-            except commands.ExtensionError as error:
-                logger.error("cog_load_failed", extension=extension, error=str(error))
 
         logger.info("cog_loading_complete", total=loaded)
 
@@ -146,6 +232,15 @@ class TwoMoonBot(commands.Bot):
         await self.tree.sync(guild=guild)
         logger.info("slash_commands_synced", guild_id=self.settings.discord.allowed_server_id)
 
+    async def close(self) -> None:
+        if self.embedder is not None:
+            await self.embedder.close()
+        if self.gateway is not None:
+            await self.gateway.aclose()
+        if self.interactions is not None:
+            await self.interactions.close()
+        await super().close()
+
     async def on_ready(self) -> None:
         logger.info(
             "bot_online",
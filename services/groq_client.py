@@ -3,6 +3,7 @@ from __future__ import annotations
 import asyncio
 from dataclasses import dataclass, field
 
+import httpx
 import structlog
 from groq import AsyncGroq, APIError, APITimeoutError, RateLimitError
 
@@ -33,9 +34,9 @@ class LLMResponse:
 # ═══════════════════════════════════════════════
 
 class GroqClient:
-    def __init__(self, config: GroqConfig) -> None:
+    def __init__(self, config: GroqConfig, http_client: httpx.AsyncClient | None = None) -> None:
         self._config = config
-        self._client = AsyncGroq(api_key=config.api_key)
+        self._client = AsyncGroq(api_key=config.api_key, http_client=http_client)
 
     async def generate(
         self,
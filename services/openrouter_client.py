@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 
+import httpx
 import structlog
 from openai import AsyncOpenAI, APIError, APITimeoutError, RateLimitError
 
@@ -16,11 +17,12 @@ logger = structlog.get_logger("twomoon.openrouter")
 # ═══════════════════════════════════════════════
 
 class OpenRouterClient:
-    def __init__(self, config: OpenRouterConfig) -> None:
+    def __init__(self, config: OpenRouterConfig, http_client: httpx.AsyncClient | None = None) -> None:
         self._config = config
         self._client = AsyncOpenAI(
             api_key=config.api_key,
             base_url=config.base_url,
+            http_client=http_client,
         )
 
     async def generate(
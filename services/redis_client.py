@@ -1,25 +1,60 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import struct
+import time
+from array import array
 from typing import Any
 
 import orjson
 import structlog
 from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 
 from config import Settings
 
 logger = structlog.get_logger("twomoon.redis")
 
 RATE_LIMIT_PREFIX = "rl:"
-CONTEXT_PREFIX = "ctx:"
+CONTEXT_PREFIX = "ctx:v4:"
 CIRCUIT_PREFIX = "cb:"
 LURKER_PREFIX = "lurk:"
+EMBEDDING_PREFIX = "emb:q8:"
+
+# register_script builds a Script object and hashes its source each call;
+# build each one once and rebuild only if a different client shows up.
+_scripts: dict[str, AsyncScript] = {}
+
+
+def _script(redis: Redis, lua: str) -> AsyncScript:
+    script = _scripts.get(lua)
+    if script is None or script.registered_client is not redis:
+        script = redis.register_script(lua)
+        _scripts[lua] = script
+    return script
 
 
 # ═══════════════════════════════════════════════
 # RATE LIMITING (Sliding Window)
 # ═══════════════════════════════════════════════
 
+# INCR first so check-and-count is one atomic round-trip; the window starts
+# with the first request. Returns {allowed, remaining | seconds until reset}.
+_RATE_LIMIT_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+local limit = tonumber(ARGV[1])
+if count > limit then
+    return {0, redis.call('TTL', KEYS[1])}
+end
+return {1, limit - count}
+"""
+
+
 async def check_rate_limit(
     redis: Redis,
     user_id: str,
@@ -28,18 +63,11 @@ async def check_rate_limit(
 ) -> dict[str, Any]:
     key = f"{RATE_LIMIT_PREFIX}{user_id}"
     try:
-        current = await redis.get(key)
-        if current is None:
-            await redis.setex(key, window_seconds, 1)
-            return {"allowed": True, "remaining": max_requests - 1}
-
-        count = int(current)
-        if count >= max_requests:
-            ttl = await redis.ttl(key)
-            return {"allowed": False, "reset_in": max(ttl, 1)}
-
-        await redis.incr(key)
-        return {"allowed": True, "remaining": max_requests - count - 1}
+        script = _script(redis, _RATE_LIMIT_LUA)
+        allowed, value = await script(keys=[key], args=[max_requests, window_seconds])
+        if not allowed:
+            return {"allowed": False, "reset_in": max(int(value), 1)}
+        return {"allowed": True, "remaining": int(value)}
     except Exception as error:
         logger.error("rate_limit_check_failed", error=str(error))
         return {"allowed": True, "remaining": max_requests}
@@ -49,29 +77,77 @@ async def check_rate_limit(
 # CONTEXT CACHE (Channel History)
 # ═══════════════════════════════════════════════
 
-async def get_context(redis: Redis, channel_id: str) -> list[dict] | None:
+# Busy channels read the same snapshot many times a second; a short-lived
+# in-process copy skips the GET and the orjson decode. Writes go through it.
+CONTEXT_SHADOW_TTL_SECONDS = 2.0
+CONTEXT_SHADOW_MAX_CHANNELS = 1024
+# Payloads past this are decoded on a worker thread instead of the event loop.
+CONTEXT_OFFLOAD_BYTES = 32 * 1024
+
+_context_shadow: dict[str, tuple[float, list[Any]]] = {}
+# Strong references to in-flight writes; the loop only keeps weak ones.
+_pending_context_writes: set[asyncio.Task] = set()
+
+
+async def get_context(redis: Redis, channel_id: str) -> list[Any] | None:
+    shadow = _context_shadow.get(channel_id)
+    if shadow is not None and time.monotonic() - shadow[0] < CONTEXT_SHADOW_TTL_SECONDS:
+        return shadow[1]
+
     key = f"{CONTEXT_PREFIX}{channel_id}"
     try:
         data = await redis.get(key)
         if data is None:
             return None
-        return orjson.loads(data)
+        if len(data) > CONTEXT_OFFLOAD_BYTES:
+            messages = await asyncio.to_thread(orjson.loads, data)
+        else:
+            messages = orjson.loads(data)
     except Exception as error:
         logger.error("context_get_failed", error=str(error))
         return None
 
+    _shadow_context(channel_id, messages)
+    return messages
+
 
 async def set_context(
     redis: Redis,
     channel_id: str,
-    messages: list[dict],
+    messages: list[Any],
     ttl_seconds: int = 300,
+) -> None:
+    _shadow_context(channel_id, messages)
+    task = asyncio.create_task(_write_context(redis, channel_id, messages, ttl_seconds))
+    _pending_context_writes.add(task)
+    task.add_done_callback(_context_write_done)
+
+
+async def _write_context(
+    redis: Redis,
+    channel_id: str,
+    messages: list[Any],
+    ttl_seconds: int,
 ) -> None:
     key = f"{CONTEXT_PREFIX}{channel_id}"
-    try:
-        await redis.setex(key, ttl_seconds, orjson.dumps(messages))
-    except Exception as error:
-        logger.error("context_set_failed", error=str(error))
+    await redis.setex(key, ttl_seconds, orjson.dumps(messages))
+
+
+def _context_write_done(task: asyncio.Task) -> None:
+    _pending_context_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("context_set_failed", error=str(task.exception()))
+
+
+def _shadow_context(channel_id: str, messages: list[Any]) -> None:
+    now = time.monotonic()
+    if channel_id not in _context_shadow and len(_context_shadow) >= CONTEXT_SHADOW_MAX_CHANNELS:
+        cutoff = now - CONTEXT_SHADOW_TTL_SECONDS
+        for stale in [cid for cid, (ts, _) in _context_shadow.items() if ts <= cutoff]:
+            del _context_shadow[stale]
+        if len(_context_shadow) >= CONTEXT_SHADOW_MAX_CHANNELS:
+            _context_shadow.clear()
+    _context_shadow[channel_id] = (now, messages)
 
 
 # ═══════════════════════════════════════════════
@@ -88,67 +164,139 @@ async def get_circuit_state(redis: Redis, provider: str) -> str:
         return "closed"
 
 
-async def set_circuit_state(
-    redis: Redis,
-    provider: str,
-    state: str,
-    ttl_seconds: int = 60,
-) -> None:
-    key = f"{CIRCUIT_PREFIX}{provider}"
+async def get_circuit_states(redis: Redis, providers: list[str]) -> dict[str, str]:
+    # One MGET for every provider's breaker, for status snapshots.
+    keys = [f"{CIRCUIT_PREFIX}{provider}" for provider in providers]
     try:
-        await redis.setex(key, ttl_seconds, state)
+        states = await redis.mget(keys)
+        return {provider: state or "closed" for provider, state in zip(providers, states)}
     except Exception as error:
-        logger.error("circuit_set_failed", error=str(error))
-
-
-async def increment_circuit_failures(redis: Redis, provider: str) -> int:
-    key = f"{CIRCUIT_PREFIX}{provider}:failures"
+        logger.error("circuit_get_failed", error=str(error))
+        return {provider: "closed" for provider in providers}
+
+
+# Atomic state transitions — one round-trip per LLM call, no get/set race.
+
+_CIRCUIT_FAILURE_LUA = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if count >= tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[2], 'open', 'EX', ARGV[2])
+end
+return count
+"""
+
+_CIRCUIT_SUCCESS_LUA = """
+redis.call('DEL', KEYS[1])
+local state = redis.call('GET', KEYS[2])
+if state and state ~= 'closed' then
+    redis.call('SET', KEYS[2], 'closed', 'EX', ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+async def record_circuit_failure(
+    redis: Redis,
+    provider: str,
+    fail_max: int,
+    open_ttl_seconds: int,
+) -> int:
+    keys = [f"{CIRCUIT_PREFIX}{provider}:failures", f"{CIRCUIT_PREFIX}{provider}"]
     try:
-        count = await redis.incr(key)
-        if count == 1:
-            await redis.expire(key, 120)
-        return count
+        script = _script(redis, _CIRCUIT_FAILURE_LUA)
+        return int(await script(keys=keys, args=[fail_max, open_ttl_seconds, 120]))
     except Exception as error:
-        logger.error("circuit_incr_failed", error=str(error))
+        logger.error("circuit_record_failure_failed", error=str(error))
         return 0
 
 
-async def reset_circuit_failures(redis: Redis, provider: str) -> None:
-    key = f"{CIRCUIT_PREFIX}{provider}:failures"
+async def record_circuit_success(redis: Redis, provider: str, ttl_seconds: int = 60) -> bool:
+    keys = [f"{CIRCUIT_PREFIX}{provider}:failures", f"{CIRCUIT_PREFIX}{provider}"]
     try:
-        await redis.delete(key)
+        script = _script(redis, _CIRCUIT_SUCCESS_LUA)
+        return bool(await script(keys=keys, args=[ttl_seconds]))
     except Exception as error:
-        logger.error("circuit_reset_failed", error=str(error))
+        logger.error("circuit_record_success_failed", error=str(error))
+        return False
 
 
 # ═══════════════════════════════════════════════
 # LURKER COOLDOWN
 # ═══════════════════════════════════════════════
 
-async def check_lurker_cooldown(
+async def try_acquire_lurker(
     redis: Redis,
     channel_id: str,
     cooldown_seconds: int,
 ) -> bool:
+    # SET NX EX: checks and starts the cooldown atomically, so two messages
+    # racing in the same channel can't both lurk.
     key = f"{LURKER_PREFIX}{channel_id}"
     try:
-        exists = await redis.exists(key)
-        return not exists
+        return bool(await redis.set(key, "1", nx=True, ex=cooldown_seconds))
     except Exception as error:
-        logger.error("lurker_cooldown_check_failed", error=str(error))
+        logger.error("lurker_acquire_failed", error=str(error))
         return False
 
 
-async def set_lurker_cooldown(
+async def release_lurker(redis: Redis, channel_id: str) -> None:
+    key = f"{LURKER_PREFIX}{channel_id}"
+    try:
+        await redis.delete(key)
+    except Exception as error:
+        logger.error("lurker_release_failed", error=str(error))
+
+
+# ═══════════════════════════════════════════════
+# EMBEDDING CACHE
+# ═══════════════════════════════════════════════
+
+# Cached embeddings are int8-quantized with a per-vector scale and base64
+# encoded (the pool decodes responses to str): ~4x smaller than float32.
+
+def _quantize_embedding(embedding: list[float]) -> str:
+    peak = max((abs(v) for v in embedding), default=0.0)
+    scale = peak / 127 if peak else 1.0
+    quantized = array("b", (round(v / scale) for v in embedding))
+    return base64.b64encode(struct.pack("<f", scale) + quantized.tobytes()).decode("ascii")
+
+
+def _dequantize_embedding(payload: str) -> list[float]:
+    raw = base64.b64decode(payload)
+    (scale,) = struct.unpack_from("<f", raw)
+    return [v * scale for v in array("b", raw[4:])]
+
+
+def _embedding_key(text: str) -> str:
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{EMBEDDING_PREFIX}{digest}"
+
+
+async def get_embedding(redis: Redis, text: str) -> list[float] | None:
+    try:
+        data = await redis.get(_embedding_key(text))
+        if data is None:
+            return None
+        return _dequantize_embedding(data)
+    except Exception as error:
+        logger.error("embedding_get_failed", error=str(error))
+        return None
+
+
+async def set_embedding(
     redis: Redis,
-    channel_id: str,
-    cooldown_seconds: int,
+    text: str,
+    embedding: list[float],
+    ttl_seconds: int = 3600,
 ) -> None:
-    key = f"{LURKER_PREFIX}{channel_id}"
     try:
-        await redis.setex(key, cooldown_seconds, "1")
+        await redis.setex(_embedding_key(text), ttl_seconds, _quantize_embedding(embedding))
     except Exception as error:
-        logger.error("lurker_cooldown_set_failed", error=str(error))
+        logger.error("embedding_set_failed", error=str(error))
 
 
 # ═══════════════════════════════════════════════
@@ -169,4 +317,41 @@ async def cache_set(redis: Redis, key: str, value: Any, ttl_seconds: int = 600)
     try:
         await redis.setex(key, ttl_seconds, orjson.dumps(value))
     except Exception:
-        pass
\ No newline at end of file
+        pass
+
+
+async def cache_delete(redis: Redis, *keys: str) -> None:
+    try:
+        await redis.delete(*keys)
+    except Exception:
+        pass
+
+
+async def cache_mget(redis: Redis, keys: list[str]) -> list[Any | None]:
+    try:
+        values = await redis.mget(keys)
+        return [orjson.loads(value) if value is not None else None for value in values]
+    except Exception:
+        return [None] * len(keys)
+
+
+async def cache_mset(redis: Redis, values: dict[str, Any], ttl_seconds: int = 600) -> None:
+    if not values:
+        return
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key, value in values.items():
+                pipe.setex(key, ttl_seconds, orjson.dumps(value))
+            await pipe.execute()
+    except Exception:
+        pass
+
+
+async def cache_delete_pattern(redis: Redis, pattern: str, *keys: str) -> None:
+    # Explicit keys ride along in the same DEL as the pattern matches.
+    try:
+        matched = [key async for key in redis.scan_iter(match=pattern, count=1000)]
+        if matched or keys:
+            await redis.delete(*keys, *matched)
+    except Exception as error:
+        logger.error("cache_delete_pattern_failed", pattern=pattern, error=str(error))
@@ -28,24 +28,34 @@ COMMON_TYPOS: dict[str, list[str]] = {
 }
 
 TYPO_RATES = {"light": 0.02, "medium": 0.05, "heavy": 0.08}
+_TYPO_KEYSET = frozenset(COMMON_TYPOS)
 
 
 def inject_typos(text: str, intensity: str = "heavy") -> str:
-    rate = TYPO_RATES.get(intensity, 0.05)
     words = text.split()
+    # No typo candidate and nothing long enough to swap: no dice get rolled,
+    # so the loop would only rejoin the words.
+    if max(map(len, words), default=0) <= 4 and _TYPO_KEYSET.isdisjoint(map(str.lower, words)):
+        return " ".join(words)
+
+    rate = TYPO_RATES.get(intensity, 0.05)
+    swap_rate = rate * 0.5
+    typos = COMMON_TYPOS
+    rand = random.random
     result = []
+    append = result.append
 
     for word in words:
-        lower = word.lower()
-        if lower in COMMON_TYPOS and random.random() < rate:
-            replacement = random.choice(COMMON_TYPOS[lower])
+        variants = typos.get(word.lower())
+        if variants is not None and rand() < rate:
+            replacement = random.choice(variants)
             if word[0].isupper():
                 replacement = replacement.capitalize()
-            result.append(replacement)
-        elif len(word) > 4 and random.random() < rate * 0.5:
-            result.append(_swap_adjacent(word))
+            append(replacement)
+        elif len(word) > 4 and rand() < swap_rate:
+            append(_swap_adjacent(word))
         else:
-            result.append(word)
+            append(word)
 
     return " ".join(result)
 
@@ -54,9 +64,7 @@ def _swap_adjacent(word: str) -> str:
     if len(word) < 3:
         return word
     idx = random.randint(1, len(word) - 2)
-    chars = list(word)
-    chars[idx], chars[idx + 1] = chars[idx + 1], chars[idx]
-    return "".join(chars)
+    return word[:idx] + word[idx + 1] + word[idx] + word[idx + 2:]
 
 
 # ═══════════════════════════════════════════════
@@ -64,6 +72,7 @@ def _swap_adjacent(word: str) -> str:
 # ═══════════════════════════════════════════════
 
 FILLERS_START = ["oh", "hmm", "eh", "ah", "well", "ngl", "honestly"]
+_FILLERS_START_TUPLE = tuple(FILLERS_START)
 FILLERS_MID = ["like", "tho", "kinda", "lowkey"]
 FILLER_RATES = {"light": 0.03, "medium": 0.08, "heavy": 0.12}
 
@@ -71,7 +80,7 @@ FILLER_RATES = {"light": 0.03, "medium": 0.08, "heavy": 0.12}
 def inject_fillers(text: str, intensity: str = "heavy") -> str:
     rate = FILLER_RATES.get(intensity, 0.08)
 
-    if random.random() < rate and not text.startswith(tuple(FILLERS_START)):
+    if random.random() < rate and not text.startswith(_FILLERS_START_TUPLE):
         filler = random.choice(FILLERS_START)
         text = f"{filler} {text}"
 
@@ -90,7 +99,7 @@ def inject_fillers(text: str, intensity: str = "heavy") -> str:
 # ═══════════════════════════════════════════════
 
 def normalize_case(text: str) -> str:
-    if text.isupper() and len(text) < 30:
+    if len(text) < 30 and text.isupper():
         return text
 
     result = text.lower()
@@ -105,10 +114,20 @@ def normalize_case(text: str) -> str:
 # PUNCTUATION CLEANUP
 # ═══════════════════════════════════════════════
 
+_DOTS_RE = re.compile(r"\.{4,}")
+_BANGS_RE = re.compile(r"!{3,}")
+_QMARKS_RE = re.compile(r"\?{3,}")
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+
+
 def clean_punctuation(text: str) -> str:
-    text = re.sub(r"\.{4,}", "...", text)
-    text = re.sub(r"!{3,}", "!!", text)
-    text = re.sub(r"\?{3,}", "??", text)
+    # Each run needs its literal minimum present; most replies have none.
+    if "...." in text:
+        text = _DOTS_RE.sub("...", text)
+    if "!!!" in text:
+        text = _BANGS_RE.sub("!!", text)
+    if "???" in text:
+        text = _QMARKS_RE.sub("??", text)
 
     if text.endswith(".") and len(text) < 40 and random.random() < 0.6:
         text = text[:-1]
@@ -124,7 +143,11 @@ def split_message(text: str, max_per_chunk: int = 80) -> list[str]:
     if len(text) <= max_per_chunk:
         return [text]
 
-    sentences = re.split(r"(?<=[.!?])\s+", text)
+    # No terminator means no boundary, so the split pass is skipped outright.
+    if "." in text or "!" in text or "?" in text:
+        sentences = _SENTENCE_SPLIT_RE.split(text)
+    else:
+        sentences = [text]
 
     if len(sentences) <= 1:
         words = text.split()
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 
 # ═══════════════════════════════════════════════
 # CLAN TAG PATTERNS
@@ -13,19 +14,24 @@ CLAN_PREFIXES = [
     "RX_", "rx_", "PH_", "ph_",
 ]
 
-CLAN_TAG_RE = re.compile(
-    r"^(?:\[[^\]]{1,6}\]|【[^】]{1,6}】|\([^)]{1,6}\)|<[^>]{1,6}>)\s*"
-)
+# First listed prefix wins, as with the old startswith loop.
+CLAN_PREFIX_RE = re.compile("^(?:" + "|".join(re.escape(p) for p in CLAN_PREFIXES) + ")")
+
+# Leading bracket-style tags: [2M], 【TM】, (GD), <RX> with 1-6 characters inside.
+CLAN_TAG_BRACKETS = {"[": "]", "【": "】", "(": ")", "<": ">"}
 
 SEPARATOR_RE = re.compile(r"[_\-.|•·]")
 SPECIAL_CHARS_RE = re.compile(r"[^\w\s]", re.UNICODE)
 MULTI_SPACE_RE = re.compile(r"\s{2,}")
+# ASCII-only equivalent of SPECIAL_CHARS_RE for str.translate.
+_ASCII_SPECIAL_DELETE = {c: None for c in range(128) if SPECIAL_CHARS_RE.match(chr(c))}
 
 
 # ═══════════════════════════════════════════════
 # MAIN EXTRACTION
 # ═══════════════════════════════════════════════
 
+@lru_cache(maxsize=4096)
 def extract_nickname(display_name: str) -> str:
     if not display_name or not display_name.strip():
         return "user"
@@ -33,23 +39,28 @@ def extract_nickname(display_name: str) -> str:
     name = display_name.strip()
 
     # ─── Remove bracket-style clan tags: [2M], 【TM】, (GD), <RX> ───
-    name = CLAN_TAG_RE.sub("", name).strip()
+    name = _strip_clan_tag(name).strip()
 
     # ─── Remove prefix-style clan tags: 2M_, TM_, etc ───
-    for prefix in CLAN_PREFIXES:
-        if name.startswith(prefix):
-            name = name[len(prefix):]
-            break
-
-    # ─── Split by separators, take first meaningful part ───
-    parts = SEPARATOR_RE.split(name)
-    parts = [p.strip() for p in parts if p.strip()]
-
-    if parts:
-        name = parts[0]
+    name = CLAN_PREFIX_RE.sub("", name, count=1)
+
+    # ─── Take the first meaningful separator-delimited part ───
+    # Usually that's everything before the first separator; only a leading
+    # separator (empty head) needs the full split.
+    sep = SEPARATOR_RE.search(name)
+    head = (name[:sep.start()] if sep else name).strip()
+    if head:
+        name = head
+    elif sep:
+        parts = [p.strip() for p in SEPARATOR_RE.split(name) if p.strip()]
+        if parts:
+            name = parts[0]
 
     # ─── Remove special characters (keep Unicode letters) ───
-    cleaned = SPECIAL_CHARS_RE.sub("", name).strip()
+    if name.isascii():
+        cleaned = name.translate(_ASCII_SPECIAL_DELETE).strip()
+    else:
+        cleaned = SPECIAL_CHARS_RE.sub("", name).strip()
     cleaned = MULTI_SPACE_RE.sub(" ", cleaned)
 
     if not cleaned:
@@ -69,6 +80,18 @@ def extract_nickname(display_name: str) -> str:
     return cleaned.lower()
 
 
+def _strip_clan_tag(name: str) -> str:
+    # The first closing bracket must come after 1-6 tag characters,
+    # i.e. at index 2..7; the caller strips the whitespace that follows.
+    close = CLAN_TAG_BRACKETS.get(name[:1])
+    if close is None:
+        return name
+    end = name.find(close, 1, 8)
+    if end < 2:
+        return name
+    return name[end + 1:]
+
+
 # ═══════════════════════════════════════════════
 # MENTION FORMATTER
 # ═══════════════════════════════════════════════
@@ -81,8 +104,4 @@ def format_user_label(display_name: str, user_id: str) -> str:
 def build_user_list(users: dict[str, str]) -> str:
     if not users:
         return ""
-    lines = []
-    for uid, display in users.items():
-        nick = extract_nickname(display)
-        lines.append(f"{nick} = <@{uid}>")
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join([f"{extract_nickname(display)} = <@{uid}>" for uid, display in users.items()])
\ No newline at end of file